@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+batch_agent.py
+Modo batch (OpenAI Batch API) para backlogs de rascunho e design que só serão publicados
+dias depois e não precisam de latência interativa (custo ~50% menor).
+
+• submit : junta todas as fichas sem rascunho e todos os rascunhos sem HTML num único JSONL,
+           envia como batch job e grava o estado em 'batch/<job>.json' no bucket.
+• collect: consulta os jobs abertos registrados no bucket — de qualquer execução anterior —
+           e, quando concluídos, grava os resultados em 'rascunho/' e 'htmlblog/' com as
+           mesmas funções do modo online (draft_agent / design_agent).
+Sem argumento executa collect e depois submit; `--wait` consulta até os jobs terminarem.
+Para testar localmente, aponte OPENAI_BASE_URL para fake_openai_batch.py.
+
+Uso: python3 batch_agent.py [submit|collect] [--wait]
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from utils import (
+    load_env, get_env, set_gcp_credentials, init_storage_client, init_openai_client,
+    list_blob_names, download_blob_text, upload_blob_text, filter_json_blobs,
+    get_basename, print_log, print_upload_stats
+)
+from draft_agent import (
+    listar_fichas_pendentes, montar_requisicao_rascunho, interpretar_rascunho, salvar_rascunho
+)
+from design_agent import design_request, save_html, find_pending_rascunhos, update_search_index
+from rate_limit import set_usage_context, record_usage
+from profiling import run_profiled
+
+ENDPOINT = "/v1/chat/completions"
+# estados terminais do lado da OpenAI; "collected" é nosso (resultados já gravados)
+CLOSED_STATES = {"collected", "failed", "expired", "cancelled"}
+
+
+def load_jobs(client, bucket, batch_folder):
+    jobs = []
+    for path in filter_json_blobs(list_blob_names(client, bucket, batch_folder)):
+        jobs.append(json.loads(download_blob_text(client, bucket, path)))
+    return jobs
+
+
+def save_job(client, bucket, batch_folder, job):
+    upload_blob_text(client, bucket, f"{batch_folder}/{job['id']}.json",
+                     json.dumps(job, ensure_ascii=False, indent=2))
+
+
+def reserved_requests(jobs):
+    """custom_ids que já estão em algum job aberto — não devem ser reenviados."""
+    return {cid for job in jobs if job["status"] not in CLOSED_STATES for cid in job["requests"]}
+
+
+def build_batch_lines(client, bucket, cfg, reserved):
+    lines, requests = [], {}
+
+    def add(kind, base, body):
+        custom_id = f"{kind}:{base}"
+        if custom_id in reserved:
+            return
+        lines.append(json.dumps(
+            {"custom_id": custom_id, "method": "POST", "url": ENDPOINT, "body": body},
+            ensure_ascii=False
+        ))
+        requests[custom_id] = {"kind": kind, "base": base}
+
+    for caminho, base in listar_fichas_pendentes(client, bucket, cfg["ficha"], cfg["rasc"]):
+        ficha_data = json.loads(download_blob_text(client, bucket, caminho))
+        add("draft", base, montar_requisicao_rascunho(cfg["draft_model"], ficha_data))
+
+    rascs = filter_json_blobs(list_blob_names(client, bucket, cfg["rasc"]))
+    htmls = list_blob_names(client, bucket, cfg["html"])
+    for target in find_pending_rascunhos(rascs, htmls):
+        base = os.path.splitext(get_basename(target))[0]
+        draft_data = json.loads(download_blob_text(client, bucket, target))
+        if not draft_data.get("theme") or not draft_data.get("topics"):
+            print_log(f"⚠️ Rascunho sem 'theme' ou 'topics', ignorado: {target}")
+            continue
+        add("design", base, design_request(cfg["design_model"], draft_data))
+
+    return lines, requests
+
+
+def submit(client, bucket, openai_client, cfg, jobs):
+    lines, requests = build_batch_lines(client, bucket, cfg, reserved_requests(jobs))
+    if not lines:
+        print_log("🔍 Nada pendente para enviar em batch.")
+        return None
+
+    payload = ("\n".join(lines) + "\n").encode("utf-8")
+    print_log(f"📤 Enviando batch com {len(lines)} requisições ({len(payload) / 1024:.1f} KB)...")
+    input_file = openai_client.files.create(file=("batch.jsonl", payload), purpose="batch")
+    batch = openai_client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=ENDPOINT,
+        completion_window=cfg["window"],
+        metadata={"source": "hub-bloglinkedincontent"},
+    )
+    job = {
+        "id": batch.id,
+        "status": batch.status,
+        "input_file_id": input_file.id,
+        "output_file_id": None,
+        "error_file_id": None,
+        "submitted_at": datetime.utcnow().isoformat(),
+        "requests": requests,
+    }
+    save_job(client, bucket, cfg["batch"], job)
+    print_log(f"✅ Batch {batch.id} enviado; estado em gs://{bucket}/{cfg['batch']}/{batch.id}.json")
+    return job
+
+
+def _apply_result(client, bucket, cfg, job, line, existing):
+    custom_id = line["custom_id"]
+    spec = job["requests"].get(custom_id)
+    response = line.get("response") or {}
+    if spec is None or response.get("status_code") != 200:
+        print_log(f"❌ {custom_id}: {line.get('error') or response.get('status_code')}")
+        return False
+
+    body = response["body"]
+    content = body["choices"][0]["message"]["content"].strip()
+    base = spec["base"]
+    set_usage_context(article=base)
+    usage = body.get("usage") or {}
+    details = usage.get("prompt_tokens_details") or {}
+    record_usage(body.get("model", ""), usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0),
+                 0.0, cached_tokens=details.get("cached_tokens") or 0,
+                 cost_factor=0.5, batch=job["id"])
+
+    if spec["kind"] == "draft":
+        if base in existing["rasc"]:
+            print_log(f"↷ Rascunho {base} já gerado pelo modo online; resultado do batch descartado.")
+            return True
+        destino = salvar_rascunho(client, bucket, cfg["rasc"], base, interpretar_rascunho(content))
+        print_log(f"✅ Rascunho salvo em gs://{bucket}/{destino}")
+    else:
+        if base in existing["html"]:
+            print_log(f"↷ HTML {base} já gerado pelo modo online; resultado do batch descartado.")
+            return True
+        # o rascunho de origem alimenta o manifesto de seções (re-renderização incremental)
+        draft_data = json.loads(download_blob_text(client, bucket, f"{cfg['rasc']}/{base}.json"))
+        output_path = save_html(client, bucket, cfg["html"], base, content, draft_data)
+        print_log(f"✅ HTML gerado e salvo em gs://{bucket}/{output_path}")
+        update_search_index(client, bucket, base, content, draft_data)
+    return True
+
+
+def collect(client, bucket, openai_client, cfg, jobs):
+    """Atualiza os jobs abertos; grava resultados dos concluídos. Retorna nº de jobs ainda abertos."""
+    still_open = 0
+    for job in jobs:
+        if job["status"] in CLOSED_STATES:
+            continue
+        batch = openai_client.batches.retrieve(job["id"])
+        job["status"] = batch.status
+        job["output_file_id"] = batch.output_file_id
+        job["error_file_id"] = batch.error_file_id
+        print_log(f"→ Batch {job['id']}: {batch.status}")
+
+        if batch.status == "completed":
+            existing = {
+                "rasc": {os.path.splitext(get_basename(r))[0]
+                         for r in filter_json_blobs(list_blob_names(client, bucket, cfg["rasc"]))},
+                "html": {os.path.splitext(get_basename(h))[0]
+                         for h in list_blob_names(client, bucket, cfg["html"]) if h.endswith(".html")},
+            }
+            ok = failed = 0
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if not file_id:
+                    continue
+                for raw in openai_client.files.content(file_id).text.splitlines():
+                    if not raw.strip():
+                        continue
+                    # resultado malformado conta como falha: o job fecha (libera a reserva) e a
+                    # requisição volta a ser enviada; erro do bucket ainda aborta e o job fica aberto
+                    try:
+                        applied = _apply_result(client, bucket, cfg, job, json.loads(raw), existing)
+                    except (ValueError, KeyError, IndexError, TypeError) as e:
+                        print_log(f"❌ Resultado inválido no batch {job['id']} ({type(e).__name__}: {e}); "
+                                  "será reenviado.")
+                        applied = False
+                    if applied:
+                        ok += 1
+                    else:
+                        failed += 1
+            job["status"] = "collected"
+            job["collected_at"] = datetime.utcnow().isoformat()
+            print_log(f"📥 Batch {job['id']}: {ok} resultados gravados, {failed} falhas (serão reenviadas).")
+        elif batch.status not in CLOSED_STATES:
+            still_open += 1
+        save_job(client, bucket, cfg["batch"], job)
+    return still_open
+
+
+def main():
+    print_log("=== Iniciando batch_agent ===")
+    load_env()
+    print_log("Ambiente carregado.")
+
+    args = sys.argv[1:]
+    mode = next((a for a in args if not a.startswith("--")), "all")
+    wait = "--wait" in args
+    if mode not in ("submit", "collect", "all"):
+        print_log(f"❌ Modo inválido '{mode}'. Uso: batch_agent.py [submit|collect] [--wait]")
+        sys.exit(1)
+
+    AUTH_JSON = get_env("AUTH_JSON_PATH")
+    cfg = {
+        "ficha":        get_env("FICHAUM_FOLDER", "fichaum"),
+        "rasc":         get_env("RASCUNHO_FOLDER", "rascunho"),
+        "html":         get_env("HTML_FOLDER", "htmlblog"),
+        "batch":        get_env("BATCH_FOLDER", "batch"),
+        "window":       get_env("BATCH_COMPLETION_WINDOW", "24h"),
+        "draft_model":  get_env("OPENAI_MODEL", "gpt-4o"),
+        "design_model": get_env("OPENAI_MODEL", "gpt-4.1"),
+    }
+    poll = int(get_env("BATCH_POLL_SECONDS", "60"))
+
+    print_log("Configurando GCP e clientes...")
+    set_gcp_credentials(AUTH_JSON)
+    client, bucket = init_storage_client()
+    openai_client  = init_openai_client()
+
+    jobs = load_jobs(client, bucket, cfg["batch"])
+    print_log(f"→ {len(jobs)} jobs registrados, {len(reserved_requests(jobs))} requisições em andamento.")
+
+    if mode in ("collect", "all"):
+        collect(client, bucket, openai_client, cfg, jobs)
+    if mode in ("submit", "all"):
+        job = submit(client, bucket, openai_client, cfg, jobs)
+        if job:
+            jobs.append(job)
+    while wait and collect(client, bucket, openai_client, cfg, jobs):
+        print_log(f"⏳ Jobs ainda em processamento; nova consulta em {poll}s...")
+        time.sleep(poll)
+    print_upload_stats()
+
+
+if __name__ == "__main__":
+    run_profiled(main, "batch_agent")
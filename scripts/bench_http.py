@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+bench_http.py
+Mede o custo de abrir conexões: N requisições sequenciais ao mesmo host em três modos
+  • requests   — `requests.get` avulso por chamada (como os scripts faziam antes);
+  • sem pool   — um cliente httpx novo por chamada (DNS + TCP + TLS a cada vez);
+  • pool       — o cliente compartilhado de utils.get_http_client (keep-alive/HTTP/2).
+Para os modos httpx, o tempo de setup (TCP + TLS) vem do trace do httpcore.
+
+Uso:
+    python3 bench_http.py                          # api.linkedin.com (401 sem token, basta)
+    python3 bench_http.py --url https://api.openai.com/v1/models -n 50
+    python3 bench_http.py --local                  # servidor local, sem rede
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils import HTTP_STATS, get_http_client, new_http_client, print_log
+
+DEFAULT_URL = "https://api.linkedin.com/v2/me"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"      # keep-alive
+    disable_nagle_algorithm = True     # sem o atraso de ACK que distorceria o modo pool
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _local_server():
+    server = ThreadingHTTPServer(("localhost", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://localhost:{server.server_address[1]}/", server
+
+
+def _run(name, n, call):
+    before = dict(HTTP_STATS)
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+    delta = {k: HTTP_STATS[k] - before[k] for k in HTTP_STATS}
+    return {
+        "mode": name,
+        "total": sum(latencies),
+        "first": latencies[0],
+        "p50": statistics.median(latencies),
+        "p95": sorted(latencies)[max(0, int(len(latencies) * 0.95) - 1)],
+        "connections": delta["connections"],
+        "connect": delta["connect_seconds"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de setup de conexão HTTP")
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("-n", type=int, default=20, help="requisições por modo")
+    parser.add_argument("--local", action="store_true", help="usa um servidor HTTP local")
+    args = parser.parse_args()
+
+    url, server = (_local_server() if args.local else (args.url, None))
+    print_log(f"🏁 {args.n} requisições por modo em {url}")
+
+    import requests
+
+    def fresh_client():
+        with new_http_client() as client:
+            client.get(url)
+
+    pooled = get_http_client()
+    results = [
+        _run("requests", args.n, lambda: requests.get(url)),
+        _run("sem pool", args.n, fresh_client),
+        _run("pool", args.n, lambda: pooled.get(url)),
+    ]
+
+    print_log(f"{'modo':<9} {'total':>8} {'1ª':>8} {'p50':>8} {'p95':>8} {'conexões':>9} {'setup':>8}")
+    for r in results:
+        setup = f"{r['connect'] * 1000:.1f}ms" if r["mode"] != "requests" else "—"
+        conns = str(r["connections"]) if r["mode"] != "requests" else "—"
+        print_log(
+            f"{r['mode']:<9} {r['total'] * 1000:>6.1f}ms {r['first'] * 1000:>6.1f}ms "
+            f"{r['p50'] * 1000:>6.1f}ms {r['p95'] * 1000:>6.1f}ms {conns:>9} {setup:>8}"
+        )
+    base, pool = results[0], results[-1]
+    if pool["total"]:
+        print_log(f"→ pool vs requests: {base['total'] / pool['total']:.1f}x mais rápido no total")
+    if server:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
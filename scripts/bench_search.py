@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+bench_search.py
+Benchmark offline do índice de relacionados (search_index.py) em escala: gera N artigos
+sintéticos a partir do vocabulário de fixtures/articles.json (temas misturados + cauda longa
+de termos raros, semente fixa) e mede:
+  • construção do índice (tokenização + inserção de todos os artigos);
+  • tamanho do arquivo persistido (JSON e gzip, como gravado no bucket);
+  • carga do índice (gunzip + parse), gravação do delta de 1 artigo (o que cada publicação
+    custa) e compactação (carga + deltas + regravação da base, a cada SEARCH_INDEX_MAX_DELTAS);
+  • latência da consulta de relacionados (p50/p95/máx).
+
+Uso:
+    python3 bench_search.py                 # 10.000 artigos, 200 consultas
+    python3 bench_search.py -n 2000 -q 500
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import time
+from utils import get_env, print_log
+from search_index import SearchIndex, doc_terms
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+ARTICLES_FILE = os.path.join(FIXTURES, "articles.json")
+WORDS_PER_ARTICLE = 700
+
+
+def synthetic_articles(n, seed=42):
+    """(id, título, texto, campos) — cada artigo mistura 2 temas das fixtures e termos raros."""
+    with open(ARTICLES_FILE) as f:
+        fixtures = json.load(f)
+    vocab = [
+        " ".join([a["theme"], *a["topics"], *a["draft"].values()]).split()
+        for a in fixtures
+    ]
+    rng = random.Random(seed)
+    articles = []
+    for i in range(n):
+        a, b = rng.sample(range(len(fixtures)), 2)
+        words = rng.choices(vocab[a], k=WORDS_PER_ARTICLE // 2) + rng.choices(vocab[b], k=WORDS_PER_ARTICLE // 3)
+        # cauda longa: termos raros (Zipf) que diferenciam artigos do mesmo tema
+        words += [f"termo{int(rng.paretovariate(1.1)) % 50000}" for _ in range(WORDS_PER_ARTICLE // 6)]
+        rng.shuffle(words)
+        title = f"{fixtures[a]['theme']} #{i}"
+        fields = [fixtures[a]["theme"], *rng.sample(fixtures[a]["topics"], 3)]
+        articles.append((f"{20200101 + i:08d}_090000", title, " ".join(words), fields))
+    return articles
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do índice de relacionados")
+    parser.add_argument("-n", type=int, default=10000, help="artigos sintéticos (10000)")
+    parser.add_argument("-q", "--queries", type=int, default=200, help="consultas medidas (200)")
+    parser.add_argument("-k", type=int, default=3, help="relacionados por consulta (3)")
+    args = parser.parse_args()
+
+    articles = synthetic_articles(args.n)
+    print_log(f"🧪 {len(articles)} artigos sintéticos (~{WORDS_PER_ARTICLE} palavras cada)")
+
+    start = time.perf_counter()
+    index = SearchIndex()
+    for doc_id, title, text, fields in articles:
+        index.add(doc_id, title, text, fields, url=f"https://blog.exemplo.com/{doc_id}.html")
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    raw = index.to_json().encode("utf-8")
+    stored = gzip.compress(raw, compresslevel=9, mtime=0)
+    serialize = time.perf_counter() - start
+
+    start = time.perf_counter()
+    loaded = SearchIndex.from_json(gzip.decompress(stored).decode("utf-8"))
+    load = time.perf_counter() - start
+
+    max_deltas = int(get_env("SEARCH_INDEX_MAX_DELTAS", "50"))
+    new_docs = synthetic_articles(args.n + max_deltas, seed=7)[-max_deltas:]
+    start = time.perf_counter()
+    deltas = []
+    for doc_id, title, text, fields in new_docs:
+        record = {"id": doc_id, "title": title, "url": None,
+                  "terms": doc_terms(title, text, fields), "if_missing": False}
+        deltas.append(gzip.compress(json.dumps(record, ensure_ascii=False).encode("utf-8"),
+                                    compresslevel=9, mtime=0))
+    delta = (time.perf_counter() - start) / len(new_docs)
+
+    start = time.perf_counter()
+    updated = SearchIndex.from_json(gzip.decompress(stored).decode("utf-8"))
+    for data in deltas:
+        record = json.loads(gzip.decompress(data))
+        updated.add_terms(record["id"], record["title"], record["terms"], record["url"])
+    gzip.compress(updated.to_json().encode("utf-8"), compresslevel=9, mtime=0)
+    compaction = time.perf_counter() - start
+
+    rng = random.Random(1)
+    latencies = []
+    for doc_id, title, text, fields in rng.sample(articles, min(args.queries, len(articles))):
+        start = time.perf_counter()
+        loaded.related(doc_id, title, text, fields, k=args.k)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    print_log(f"🏗️ Construção: {build:.2f}s ({build / len(articles) * 1e6:.0f} µs/artigo); "
+              f"{len(index.postings)} termos")
+    print_log(f"💾 Arquivo: {len(raw) / 1024 / 1024:.1f} MB JSON → {len(stored) / 1024 / 1024:.1f} MB gzip "
+              f"(serialização {_ms(serialize)})")
+    print_log(f"📥 Carga: {_ms(load)}; delta de 1 artigo: {_ms(delta)} "
+              f"({sum(map(len, deltas)) / len(deltas) / 1024:.1f} KB gzip)")
+    print_log(f"🗜️ Compactação ({len(deltas)} deltas → base): {_ms(compaction)} "
+              f"(≈ {_ms(compaction / len(deltas))} por publicação)")
+    print_log(f"🔎 Consulta ({len(latencies)}× top-{args.k}, {get_env('SEARCH_QUERY_TERMS', '25')} termos): "
+              f"p50 {_ms(p(0.5))}, p95 {_ms(p(0.95))}, máx {_ms(latencies[-1])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+bench_tokens.py
+Benchmark offline do tamanho de prompt e de saída por estágio. Monta os prompts reais
+(head_agent.build_prompt / build_plan_prompt, draft_agent.montar_requisicao_rascunho,
+design_agent.build_prompt e a seção isolada, linkedin_utils.build_post_text_messages) a partir dos artigos
+em fixtures/articles.json, conta tokens com um tokenizer local e compara com os
+orçamentos de fixtures/token_budgets.json. Sai com código 1 se algum estágio estourar.
+
+Saída esperada de cada estágio (para custo e latência) vem das próprias fixtures: a ficha
+(head), o rascunho completo (draft), o HTML renderizado com o CSS (design) e o post (LinkedIn).
+
+Tokenizer: tiktoken (encoding do modelo; TIKTOKEN_CACHE_DIR para rodar sem rede). Sem ele,
+cai para a estimativa por caracteres de rate_limit.py e avisa. Os números mudam com o
+tokenizer, então a verificação mede com o tokenizer registrado nos orçamentos (orçamentos
+da heurística são verificados com a heurística mesmo com tiktoken instalado). Se esse
+tokenizer não estiver disponível, falha (código 1). --write-budgets usa tiktoken quando
+houver — recalibrar com ele passa a exigi-lo na verificação (e no CI).
+
+Uso:
+    python3 bench_tokens.py                    # relatório + verificação dos orçamentos
+    python3 bench_tokens.py --write-budgets    # regrava os orçamentos (medição + folga)
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+from utils import print_log
+from prompts import CSS_CONTENT
+from head_agent import build_prompt as head_prompt, build_plan_prompt
+from draft_agent import montar_requisicao_rascunho
+from design_agent import build_prompt as design_prompt
+from html_sections import render_section_local
+from prompts import build_messages
+from linkedin_utils import build_post_text_messages
+from rate_limit import CHARS_PER_TOKEN, _cost
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+ARTICLES_FILE = os.path.join(FIXTURES, "articles.json")
+BUDGETS_FILE = os.path.join(FIXTURES, "token_budgets.json")
+
+# modelo de cada estágio (padrões dos agentes) — define o encoding e o preço
+STAGE_MODELS = {
+    "head": "gpt-4o",
+    "head_plan": "gpt-4o",
+    "draft": "gpt-4o",
+    "design": "gpt-4.1",
+    "design_section": "gpt-4.1",
+    "linkedin": "gpt-4o",
+}
+
+
+HEURISTIC_NAME = f"heurística ({CHARS_PER_TOKEN:g} chars/token)"
+
+
+class Tokenizer:
+    """tiktoken quando disponível (e pedido); senão a mesma heurística de rate_limit.py."""
+
+    def __init__(self, use_tiktoken=True):
+        self.name = HEURISTIC_NAME
+        self._encodings = {}
+        self._tiktoken = None
+        if not use_tiktoken:
+            return
+        try:
+            import tiktoken
+            tiktoken.get_encoding("o200k_base")
+            self._tiktoken = tiktoken
+        except Exception as e:
+            print_log(f"⚠️ tiktoken indisponível ({type(e).__name__}); usando estimativa por caracteres.")
+            self._tiktoken = None
+
+    def _encoding(self, model):
+        if model not in self._encodings:
+            try:
+                self._encodings[model] = self._tiktoken.encoding_for_model(model)
+            except KeyError:
+                self._encodings[model] = self._tiktoken.get_encoding("o200k_base")
+            self.name = f"tiktoken ({self._encodings[model].name})"
+        return self._encodings[model]
+
+    def count(self, text, model):
+        if self._tiktoken is None:
+            return math.ceil(len(text) / CHARS_PER_TOKEN)
+        return len(self._encoding(model).encode(text))
+
+    def count_messages(self, messages, model):
+        # formato chat: ~3 tokens por mensagem + 3 de abertura da resposta
+        return sum(3 + self.count(m["content"], model) for m in messages) + 3
+
+
+def _ficha(article):
+    return {k: article[k] for k in ("timestamp", "theme", "topics")}
+
+
+def _history(articles):
+    # como fetch_last_jsons: textos das fichas gravadas (indent=2)
+    return [json.dumps(_ficha(a), ensure_ascii=False, indent=2) for a in articles]
+
+
+def _expected_html(article):
+    """HTML no formato pedido pelo DESIGN_SYSTEM — aproxima a saída do design_agent."""
+    sections = "\n".join(
+        f"<h2>{t}</h2>\n<p>{article['draft'][t]}</p>" for t in article["topics"]
+    )
+    return (
+        "<!DOCTYPE html>\n<html lang=\"pt-BR\">\n<head>\n<meta charset=\"UTF-8\">\n"
+        "<meta name=\"viewport\" content=\"width=device-width, initial-scale=1.0\">\n"
+        f"<title>{article['theme']}</title>\n<style>\n{CSS_CONTENT}\n</style>\n</head>\n<body>\n"
+        f"<div class=\"container\">\n<h1>{article['theme']}</h1>\n{sections}\n</div>\n</body>\n</html>"
+    )
+
+
+def article_without_post(article):
+    return {k: v for k, v in article.items() if k != "linkedin"}
+
+
+def build_cases(articles):
+    """(estágio, mensagens, texto_de_saída_esperado) para cada fixture."""
+    cases = []
+    history = _history(articles)
+    for i, article in enumerate(articles):
+        ficha = json.dumps(_ficha(article), ensure_ascii=False, indent=2)
+        # histórico do head: até 5 fichas anteriores, como no agente
+        previous = history[max(0, i - 5):i]
+        previous += ["vazio"] * (5 - len(previous))
+        cases.append(("head", head_prompt(previous), ficha))
+        cases.append(("draft", montar_requisicao_rascunho(STAGE_MODELS["draft"], _ficha(article))["messages"],
+                      json.dumps(article_without_post(article), ensure_ascii=False)))
+        cases.append(("design", design_prompt(article["theme"], article["topics"], article),
+                      _expected_html(article)))
+        for topic in article["topics"]:
+            paragraph = article["draft"][topic]
+            # mesma montagem de design_agent.render_section_llm
+            cases.append(("design_section",
+                          build_messages("design_section", f"Tópico: {topic}\nParágrafo:\n{paragraph}"),
+                          render_section_local(topic, paragraph)))
+        url = f"https://blog.exemplo.com/{article['timestamp']}.html"
+        cases.append(("linkedin", build_post_text_messages(article["theme"], url), article["linkedin"]))
+    plan_output = json.dumps([{"theme": a["theme"], "topics": a["topics"]} for a in articles],
+                             ensure_ascii=False)
+    cases.append(("head_plan", build_plan_prompt(history, len(articles)), plan_output))
+    return cases
+
+
+def measure(cases, tokenizer):
+    """Pior caso por estágio (prompt e saída) + custo estimado da chamada mais cara."""
+    stages = {}
+    for stage, messages, output in cases:
+        model = STAGE_MODELS[stage]
+        prompt = tokenizer.count_messages(messages, model)
+        out = tokenizer.count(output, model)
+        st = stages.setdefault(stage, {"model": model, "prompt": 0, "system": 0, "output": 0, "cases": 0})
+        st["prompt"] = max(st["prompt"], prompt)
+        st["system"] = max(st["system"], tokenizer.count(messages[0]["content"], model))
+        st["output"] = max(st["output"], out)
+        st["cases"] += 1
+    for st in stages.values():
+        st["cost"] = _cost(st["model"], st["prompt"], st["output"])
+    return stages
+
+
+def check(stages, budgets):
+    failures = []
+    for stage, st in stages.items():
+        budget = budgets.get(stage)
+        if budget is None:
+            failures.append(f"{stage}: sem orçamento em {os.path.basename(BUDGETS_FILE)}")
+            continue
+        for key in ("prompt", "output"):
+            if st[key] > budget[key]:
+                failures.append(f"{stage}: {key} {st[key]} tokens > orçamento {budget[key]}")
+    return failures
+
+
+def write_budgets(stages, tokenizer, headroom):
+    budgets = {
+        "tokenizer": tokenizer.name,
+        "headroom": headroom,
+        "stages": {
+            stage: {"prompt": math.ceil(st["prompt"] * (1 + headroom)),
+                    "output": math.ceil(st["output"] * (1 + headroom))}
+            for stage, st in sorted(stages.items())
+        },
+    }
+    with open(BUDGETS_FILE, "w") as f:
+        json.dump(budgets, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    print_log(f"📝 Orçamentos gravados em {BUDGETS_FILE} (folga de {headroom:.0%}).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Orçamento de tokens por estágio")
+    parser.add_argument("--write-budgets", action="store_true", help="regrava os orçamentos a partir da medição")
+    parser.add_argument("--headroom", type=float, default=0.15, help="folga ao regravar (0.15 = +15%%)")
+    args = parser.parse_args()
+
+    with open(ARTICLES_FILE) as f:
+        articles = json.load(f)
+
+    budgets, calibrated_with = {}, None
+    if os.path.exists(BUDGETS_FILE):
+        with open(BUDGETS_FILE) as f:
+            data = json.load(f)
+        budgets, calibrated_with = data["stages"], data.get("tokenizer")
+
+    # verificação: mede com o tokenizer da calibração; recalibração: o melhor disponível
+    tokenizer = Tokenizer(use_tiktoken=args.write_budgets or calibrated_with != HEURISTIC_NAME)
+    stages = measure(build_cases(articles), tokenizer)
+
+    print_log(f"🧮 {len(articles)} artigos de fixture; tokenizer: {tokenizer.name}")
+    print_log(f"{'estágio':<15} {'modelo':<8} {'prompt':>7} {'(system)':>9} {'orç.':>6} "
+              f"{'saída':>6} {'orç.':>6} {'US$/chamada':>12}")
+    for stage, st in sorted(stages.items()):
+        budget = budgets.get(stage, {})
+        print_log(
+            f"{stage:<15} {st['model']:<8} {st['prompt']:>7} {st['system']:>9} {budget.get('prompt', '—'):>6} "
+            f"{st['output']:>6} {budget.get('output', '—'):>6} {st['cost']:>12.5f}"
+        )
+
+    if args.write_budgets:
+        write_budgets(stages, tokenizer, args.headroom)
+        return
+
+    failures = check(stages, budgets)
+    if calibrated_with != tokenizer.name:
+        # contagens de tokenizers diferentes não são comparáveis: o orçamento não vale nada
+        failures.insert(0, f"orçamentos calibrados com {calibrated_with}, medição com {tokenizer.name} "
+                           "(recalibre com --write-budgets)")
+    if failures:
+        for msg in failures:
+            print_log(f"❌ {msg}")
+        sys.exit(1)
+    print_log("✅ Todos os estágios dentro do orçamento.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+compact_archive.py
+Compactação do histórico: cada artigo finalizado (ficha + rascunho + HTML + manifesto de
+seções) vira uma linha JSONL acrescentada ao segmento mensal '<ARCHIVE_FOLDER>/<AAAA-MM>.jsonl',
+e os objetos avulsos saem de fichaum/, rascunho/ e htmlblog/ — as listagens desses prefixos
+deixam de crescer e o histórico passa a ser lido por utils.load_archive_index / read_archive.
+
+Finalizado = tem rascunho e HTML, é mais antigo que ARCHIVE_MIN_AGE_DAYS, não está entre os
+ARCHIVE_KEEP_LIVE mais recentes e não tem trabalho pendente (capa/compartilhamento em
+'backfill/' ou item no buffer 'ready/'). Capas e variantes (.jpg/.webp) continuam no lugar:
+são as URLs públicas usadas pelos posts; o registro só guarda o caminho.
+
+O segmento é só acrescentado: as linhas novas sobem como um objeto temporário que é
+concatenado ao segmento com compose (sem reescrever o que já existe). Compose e índice são
+gravados com if_generation_match, então duas compactações simultâneas não corrompem offsets:
+a segunda falha. Os objetos avulsos só são apagados depois que o índice com os novos offsets
+foi gravado.
+
+Uso: python3 compact_archive.py [--dry-run]
+"""
+
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from google.api_core.exceptions import NotFound
+from utils import (
+    load_env, get_env, set_gcp_credentials, init_storage_client, list_blob_names,
+    download_blob_text, upload_blob_bytes, upload_blob_text, delete_blob, get_basename,
+    archive_folder, load_archive_index, ARCHIVE_INDEX, print_log, print_upload_stats
+)
+from html_sections import MANIFEST_SUFFIX
+from profiling import run_profiled
+
+SEGMENT_CONTENT_TYPE = "application/x-ndjson"
+
+
+def _bases(client, bucket, folder, ext):
+    return {
+        os.path.splitext(get_basename(n))[0]: n
+        for n in list_blob_names(client, bucket, folder)
+        if n.endswith(ext) and not n.endswith(MANIFEST_SUFFIX)
+    }
+
+
+def _base_time(base):
+    try:
+        return datetime.strptime(base[:15], "%Y%m%d_%H%M%S")
+    except ValueError:
+        return None
+
+
+def segment_name(base):
+    t = _base_time(base)
+    return f"{t:%Y-%m}.jsonl" if t else "sem-data.jsonl"
+
+
+def find_finished(client, bucket, cfg, index):
+    """Bases prontas para arquivar, da mais antiga para a mais nova."""
+    htmls = _bases(client, bucket, cfg["html"], ".html")
+    rascs = _bases(client, bucket, cfg["rasc"], ".json")
+    # trabalho em andamento: capa/compartilhamento adiados e buffer de publicação
+    busy = {get_basename(n).split(".")[0] for n in list_blob_names(client, bucket, cfg["backfill"])}
+    busy |= {get_basename(n).split(".")[0] for n in list_blob_names(client, bucket, cfg["ready"])
+             if "/" not in n[len(cfg["ready"]) + 1:]}
+
+    cutoff = datetime.utcnow() - timedelta(days=cfg["min_age_days"])
+    complete = sorted(b for b in htmls if b in rascs)
+    recent = set(complete[-cfg["keep_live"]:]) if cfg["keep_live"] else set()
+    return [
+        b for b in complete
+        if b not in recent and b not in busy and b not in index["entries"]
+        and (_base_time(b) or datetime.max) <= cutoff
+    ]
+
+
+def build_record(client, bucket, cfg, base):
+    """Linha do segmento: textos exatamente como gravados (mesmos bytes nos prompts)."""
+    def text(path):
+        # só "não existe" vira None: erro transitório aborta antes de apagar o objeto avulso
+        try:
+            return download_blob_text(client, bucket, path)
+        except NotFound:
+            return None
+    manifest = text(f"{cfg['html']}/{base}{MANIFEST_SUFFIX}")
+    return {
+        "id": base,
+        "ficha": text(f"{cfg['ficha']}/{base}.json"),
+        "rascunho": text(f"{cfg['rasc']}/{base}.json"),
+        "html": text(f"{cfg['html']}/{base}.html"),
+        "sections": json.loads(manifest) if manifest else None,
+        "cover": f"{cfg['html']}/{base}.jpg",
+        "archived_at": datetime.utcnow().isoformat(),
+    }
+
+
+def append_segment(client, bucket, segment, data):
+    """Acrescenta `data` ao segmento; retorna o offset em que as linhas novas começam."""
+    gcs_bucket = client.bucket(bucket)
+    path = f"{archive_folder()}/{segment}"
+    existing = gcs_bucket.get_blob(path)
+    if existing is None:
+        upload_blob_bytes(client, bucket, path, data, SEGMENT_CONTENT_TYPE, if_generation_match=0)
+        return 0
+    # offset = tamanho real (bytes órfãos de uma execução interrompida ficam só sem índice)
+    offset = existing.size
+    chunk = f"{path}.{datetime.utcnow():%Y%m%d%H%M%S}.part"
+    upload_blob_bytes(client, bucket, chunk, data, SEGMENT_CONTENT_TYPE)
+    try:
+        target = gcs_bucket.blob(path)
+        target.content_type = SEGMENT_CONTENT_TYPE
+        # outra compactação acrescentou no meio-tempo → PreconditionFailed (offset inválido)
+        target.compose([existing, gcs_bucket.blob(chunk)], if_generation_match=existing.generation)
+    finally:
+        delete_blob(client, bucket, chunk)
+    return offset
+
+
+def compact(client, bucket, cfg, dry_run=False):
+    index, generation = load_archive_index(client, bucket, with_generation=True)
+    finished = find_finished(client, bucket, cfg, index)
+    print_log(f"→ {len(finished)} artigos finalizados para arquivar "
+              f"({len(index['entries'])} já no arquivo).")
+    if not finished or dry_run:
+        for base in finished:
+            print_log(f"   {base} → {segment_name(base)}")
+        return 0
+
+    by_segment = {}
+    for base in finished:
+        by_segment.setdefault(segment_name(base), []).append(base)
+
+    for segment, bases in sorted(by_segment.items()):
+        lines = [json.dumps(build_record(client, bucket, cfg, b), ensure_ascii=False).encode("utf-8") + b"\n"
+                 for b in bases]
+        offset = append_segment(client, bucket, segment, b"".join(lines))
+        for base, line in zip(bases, lines):
+            # tamanho sem o "\n" final: a faixa de bytes é exatamente o JSON
+            index["entries"][base] = [segment, offset, len(line) - 1]
+            offset += len(line)
+        index["segments"][segment] = offset
+        print_log(f"🗄️ {len(bases)} artigos → {archive_folder()}/{segment} ({offset / 1024:.1f} KB)")
+
+    index["updated_at"] = datetime.utcnow().isoformat()
+    # condicional: se outra compactação gravou o índice, esta falha antes de apagar qualquer objeto
+    upload_blob_text(client, bucket, f"{archive_folder()}/{ARCHIVE_INDEX}", json.dumps(index),
+                     if_generation_match=generation)
+
+    removed = 0
+    for base in finished:
+        for path in (f"{cfg['ficha']}/{base}.json", f"{cfg['rasc']}/{base}.json",
+                     f"{cfg['html']}/{base}.html", f"{cfg['html']}/{base}{MANIFEST_SUFFIX}"):
+            removed += delete_blob(client, bucket, path)
+    print_log(f"🧹 {removed} objetos avulsos removidos.")
+    return len(finished)
+
+
+def main():
+    print_log("=== Iniciando compact_archive ===")
+    load_env()
+    print_log("Ambiente carregado.")
+
+    cfg = {
+        "ficha":        get_env("FICHAUM_FOLDER", "fichaum"),
+        "rasc":         get_env("RASCUNHO_FOLDER", "rascunho"),
+        "html":         get_env("HTML_FOLDER", "htmlblog"),
+        "backfill":     get_env("BACKFILL_FOLDER", "backfill"),
+        "ready":        get_env("READY_FOLDER", "ready"),
+        "min_age_days": float(get_env("ARCHIVE_MIN_AGE_DAYS", "7")),
+        "keep_live":    int(get_env("ARCHIVE_KEEP_LIVE", "10")),
+    }
+    set_gcp_credentials(get_env("AUTH_JSON_PATH"))
+    client, bucket = init_storage_client()
+    try:
+        compact(client, bucket, cfg, dry_run="--dry-run" in sys.argv)
+    except Exception as e:
+        print_log(f"❌ Falha na compactação: {e}")
+        sys.exit(1)
+    print_upload_stats()
+
+
+if __name__ == "__main__":
+    run_profiled(main, "compact_archive")
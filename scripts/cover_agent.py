@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+cover_agent.py
+Gera a capa a partir da mesma ficha que o draft_agent.py vai rascunhar (a mais antiga sem
+rascunho; título = `theme`), sem esperar rascunho e HTML: no main.py roda em paralelo ao
+draft_agent/design_agent. Sobe o PNG original e as variantes com o mesmo nome base da ficha
+(= nome do HTML). Enquanto gera, mantém a marca '<base>.cover-pending': o post_blog.py espera
+por ela e reaproveita a capa em vez de gerar outra.
+
+Falhas não interrompem o pipeline: o post_blog.py gera a capa (ou adia para o
+cover_backfill.py) como antes.
+
+Uso: python3 cover_agent.py
+"""
+
+import json
+import sys
+import time
+from google.api_core.exceptions import PreconditionFailed
+from utils import (
+    load_env, get_env, set_gcp_credentials, init_storage_client, download_blob_text,
+    upload_blob_text, delete_blob, print_log, print_upload_stats
+)
+from draft_agent import pegar_ficha_pendente
+from image_utils import cover_claim_path, cover_original_path
+from post_blog import generate_cover
+from rate_limit import set_usage_context
+from profiling import run_profiled
+
+
+def main():
+    print_log("=== Iniciando cover_agent ===")
+    load_env()
+    print_log("Ambiente carregado.")
+
+    ficha_folder = get_env("FICHAUM_FOLDER", "fichaum")
+    rasc_folder  = get_env("RASCUNHO_FOLDER", "rascunho")
+    html_folder  = get_env("HTML_FOLDER", "htmlblog")
+
+    set_gcp_credentials(get_env("AUTH_JSON_PATH"))
+    client, bucket_name = init_storage_client()
+    try:
+        bucket = client.get_bucket(bucket_name)
+    except Exception as e:
+        print_log(f"❌ Não foi possível acessar o bucket '{bucket_name}': {e}")
+        sys.exit(1)
+
+    # mesma escolha do draft_agent.py: a capa é do artigo que está sendo escrito
+    ficha, base = pegar_ficha_pendente(client, bucket_name, ficha_folder, rasc_folder)
+    if not ficha:
+        print_log("🔍 Nenhuma ficha pendente encontrada.")
+        return
+    set_usage_context(article=base)
+
+    if bucket.get_blob(cover_original_path(html_folder, base)) is not None:
+        print_log(f"♻️ Capa de {base} já existe; nada a fazer.")
+        return
+
+    title = json.loads(download_blob_text(client, bucket_name, ficha)).get("theme", "").strip()
+    if not title:
+        print_log(f"⚠️ Ficha {ficha} sem 'theme'; a capa fica para o post_blog.py.")
+        return
+
+    claim = cover_claim_path(html_folder, base)
+    try:
+        upload_blob_text(client, bucket_name, claim, json.dumps({"started_at": time.time()}),
+                         if_generation_match=0)
+    except PreconditionFailed:
+        print_log(f"⏳ Capa de {base} já está em geração; nada a fazer.")
+        return
+    print_log(f"→ Capa para '{title}' ({base})")
+    try:
+        generate_cover(bucket, html_folder, base, title)
+    except (Exception, SystemExit) as e:
+        print_log(f"⚠️ Falha ao gerar a capa ({e}); fica para o post_blog.py.")
+        return
+    finally:
+        delete_blob(client, bucket_name, claim)
+    print_upload_stats()
+
+
+if __name__ == "__main__":
+    run_profiled(main, "cover_agent")
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+cover_backfill.py
+Completa as publicações que saíram sem capa (post_blog.py estourou COVER_DEADLINE_SECONDS
+ou a geração falhou). Para cada registro em 'backfill/<base>.json':
+  • reaproveita o PNG original '<html_folder>/<base>.png' se a geração em andamento chegou
+    a subi-lo (ou, em capas antigas, o '<base>.jpg'); senão gera uma nova capa via DALL·E;
+  • sobe as variantes responsivas e aplica o <picture> ao post com posts().patch;
+  • apaga o registro (ou incrementa `attempts` em caso de falha, para a próxima execução).
+Depois publica os compartilhamentos do LinkedIn adiados ('backfill/<base>.linkedin-*.json')
+cuja capa já existe, com a miniatura como imagem.
+
+Rode periodicamente (cron) ou após o main.py. Uso: python3 cover_backfill.py
+"""
+
+import json
+import sys
+from utils import (
+    load_env, get_env, set_gcp_credentials, init_storage_client, list_blob_names,
+    filter_json_blobs, download_blob_text, upload_blob_text, delete_blob, get_basename,
+    print_log, print_upload_stats
+)
+from credentials import get_blogger_service, get_linkedin_token
+from linkedin_utils import PENDING_SHARE_MARK, share_with_image
+from image_utils import cover_original_path
+from post_blog import generate_cover, publish_cover, patch_post_cover
+from rate_limit import set_usage_context
+from profiling import run_profiled
+
+
+def list_backfill(client, bucket, backfill_folder):
+    """Separa os registros de capa dos compartilhamentos adiados."""
+    paths = filter_json_blobs(list_blob_names(client, bucket, backfill_folder))
+    shares = [p for p in paths if PENDING_SHARE_MARK in get_basename(p)]
+    covers = [p for p in paths if p not in shares]
+    return covers, shares
+
+
+def build_cover(gcs_bucket, record):
+    """
+    Capa já enviada por uma geração atrasada é reaproveitada; só gera se não houver.
+    As variantes saem do PNG original; o '{base}.jpg' (já comprimido) só serve de fonte
+    para capas anteriores ao original guardado.
+    """
+    folder, base = record["html_folder"], record["base"]
+    existing = (gcs_bucket.get_blob(cover_original_path(folder, base))
+                or gcs_bucket.get_blob(f"{folder}/{base}.jpg"))
+    if existing is not None:
+        print_log(f"♻️ Reaproveitando a capa já enviada: {existing.name}")
+        return publish_cover(gcs_bucket, folder, base, record["post_title"], existing.download_as_bytes())
+    return generate_cover(gcs_bucket, folder, base, record["post_title"])
+
+
+def backfill_cover(client, bucket, gcs_bucket, service, path, max_attempts):
+    record = json.loads(download_blob_text(client, bucket, path))
+    set_usage_context(article=record["base"])
+    if record.get("attempts", 0) >= max_attempts:
+        print_log(f"⛔ {record['base']}: {record['attempts']} tentativas; ignorado (remova {path} para desistir).")
+        return False
+    try:
+        cover_html = build_cover(gcs_bucket, record)
+        patch_post_cover(service, record["blog_id"], record["post_id"], cover_html)
+    except (Exception, SystemExit) as e:
+        record["attempts"] = record.get("attempts", 0) + 1
+        record["last_error"] = str(e)
+        upload_blob_text(client, bucket, path, json.dumps(record, ensure_ascii=False, indent=2))
+        print_log(f"❌ {record['base']}: falha no backfill ({e}); tentativa {record['attempts']}.")
+        return False
+    delete_blob(client, bucket, path)
+    print_log(f"✅ Capa de {record['base']} aplicada a {record.get('post_url')}")
+    return True
+
+
+def publish_pending_share(client, bucket, gcs_bucket, path, pending_bases, html_folder):
+    record = json.loads(download_blob_text(client, bucket, path))
+    base = record["base"]
+    if base in pending_bases:
+        print_log(f"⏳ {base}: capa ainda pendente; compartilhamento segue adiado.")
+        return False
+    image = gcs_bucket.get_blob(f"{html_folder}/{base}_thumb.jpg") or gcs_bucket.get_blob(f"{html_folder}/{base}.jpg")
+    if image is None:
+        print_log(f"⚠️ {base}: capa não encontrada; compartilhamento segue adiado.")
+        return False
+    try:
+        share_with_image(get_linkedin_token(), record["author"], record["post_text"],
+                         record["post_title"], image.download_as_bytes())
+    except (Exception, SystemExit) as e:
+        print_log(f"❌ {base}: falha ao publicar no LinkedIn ({e}).")
+        return False
+    delete_blob(client, bucket, path)
+    return True
+
+
+def main():
+    print_log("=== Iniciando cover_backfill ===")
+    load_env()
+    print_log("Ambiente carregado.")
+
+    backfill_folder = get_env("BACKFILL_FOLDER", "backfill")
+    html_folder     = get_env("HTML_FOLDER", "htmlblog")
+    token_file      = get_env("BLOGGER_TOKEN_FILE", required=True)
+    max_attempts    = int(get_env("COVER_BACKFILL_MAX_ATTEMPTS", "5"))
+
+    set_gcp_credentials(get_env("AUTH_JSON_PATH"))
+    client, bucket = init_storage_client()
+    try:
+        gcs_bucket = client.get_bucket(bucket)
+    except Exception as e:
+        print_log(f"❌ Não foi possível acessar o bucket '{bucket}': {e}")
+        sys.exit(1)
+
+    covers, shares = list_backfill(client, bucket, backfill_folder)
+    print_log(f"→ {len(covers)} capas e {len(shares)} compartilhamentos pendentes.")
+    if not covers and not shares:
+        return
+
+    pending = set()
+    if covers:
+        service = get_blogger_service(token_file)
+        for path in covers:
+            if not backfill_cover(client, bucket, gcs_bucket, service, path, max_attempts):
+                pending.add(json.loads(download_blob_text(client, bucket, path))["base"])
+
+    published = sum(
+        publish_pending_share(client, bucket, gcs_bucket, path, pending, html_folder) for path in shares
+    )
+    print_log(f"📊 Capas aplicadas: {len(covers) - len(pending)}/{len(covers)}; "
+              f"compartilhamentos publicados: {published}/{len(shares)}")
+    print_upload_stats()
+
+
+if __name__ == "__main__":
+    run_profiled(main, "cover_backfill")
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+credentials.py
+Cache compartilhado de credenciais do Blogger e do LinkedIn com renovação proativa.
+
+• memória: uma instância por arquivo de token por processo;
+• disco: o arquivo de token é lido/gravado sob flock (<arquivo>.lock) e gravado de forma
+  atômica (tmp + os.replace) — publicadores concorrentes não corrompem o arquivo nem
+  renovam em duplicidade (quem chega depois reaproveita o token que o outro gravou);
+• renovação: faltando menos de TOKEN_REFRESH_MARGIN segundos para expirar, a renovação
+  roda numa thread em segundo plano e o chamador segue com o token ainda válido.
+  Só bloqueia se o token já estiver expirado. Sem validade conhecida, o token é usado até a
+  API recusá-lo: quem recebe 401 chama `refresh(rejected=...)` e repete a chamada uma vez;
+• métricas: latência e falhas de cada renovação, impressas ao final do processo.
+
+LinkedIn: o token fica em LINKEDIN_TOKEN_FILE (semeado a partir de LINKEDIN_ACCESS_TOKEN /
+LINKEDIN_REFRESH_TOKEN) e é renovado com LINKEDIN_CLIENT_ID / LINKEDIN_CLIENT_SECRET. Se
+LINKEDIN_ACCESS_TOKEN mudar (token trocado à mão), o cache é semeado de novo.
+"""
+
+import atexit
+import fcntl
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timezone
+from utils import get_env, print_log, get_http_client
+
+BLOGGER_SCOPES = ["https://www.googleapis.com/auth/blogger"]
+LINKEDIN_OAUTH_URL = "https://www.linkedin.com/oauth/v2/accessToken"
+
+CREDENTIAL_STATS = {}
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+@contextmanager
+def _file_lock(path):
+    with open(f"{path}.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _write_atomic(path, content):
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, "w") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+class CachedToken:
+    """
+    Base: subclasses implementam `_load()` (lê do disco), `_expires_at(value)` (epoch ou None),
+    `_refresh(value)` (devolve o valor renovado), `_dump(value)` (serializa para o disco) e
+    `_token(value)` (a string enviada à API, para reconhecer um token recusado).
+    """
+
+    name = "token"
+
+    def __init__(self, path, margin):
+        self.path = path
+        self.margin = margin
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._value = None
+        self._lock = threading.Lock()
+        self._refreshing = None
+        CREDENTIAL_STATS.setdefault(self.name, {"refreshes": 0, "failures": 0, "latencies": []})
+        _register_report()
+
+    def _remaining(self, value):
+        expires_at = self._expires_at(value)
+        return float("inf") if expires_at is None else expires_at - time.time()
+
+    def get(self):
+        with self._lock:
+            if self._value is None:
+                with _file_lock(self.path):
+                    self._value = self._load()
+            remaining = self._remaining(self._value)
+            if remaining > self.margin:
+                return self._value
+            if remaining > 0:
+                if self._refreshing is None or not self._refreshing.is_alive():
+                    # não-daemon: o processo só termina depois de gravar o token renovado
+                    self._refreshing = threading.Thread(target=self.refresh, name=f"refresh-{self.name}")
+                    self._refreshing.start()
+                return self._value
+        # expirado: não há token válido para usar, renova de forma síncrona
+        return self.refresh()
+
+    def refresh(self, rejected=None):
+        """
+        Renova o token. Com `rejected` (token que a API recusou com 401), renova mesmo que a
+        validade pareça longa ou desconhecida — a menos que o token atual já seja outro.
+        """
+        stats = CREDENTIAL_STATS[self.name]
+        with _file_lock(self.path):
+            # outro processo pode ter renovado enquanto esperávamos o lock
+            current = self._load()
+            if rejected is None:
+                reusable = self._remaining(current) > self.margin
+            else:
+                reusable = self._token(current) != rejected
+            if reusable:
+                self._value = current
+                return current
+            start = time.perf_counter()
+            try:
+                fresh = self._refresh(current)
+            except Exception as e:
+                stats["failures"] += 1
+                print_log(f"⚠️ Falha ao renovar token {self.name}: {e}")
+                if rejected is None and self._remaining(current) > 0:
+                    return current
+                raise
+            _write_atomic(self.path, self._dump(fresh))
+            latency = time.perf_counter() - start
+        stats["refreshes"] += 1
+        stats["latencies"].append(latency)
+        self._value = fresh
+        print_log(f"🔄 Token {self.name} renovado em {latency:.2f}s.")
+        return fresh
+
+
+class BloggerToken(CachedToken):
+    name = "blogger"
+
+    def _load(self):
+        from google.oauth2.credentials import Credentials
+        return Credentials.from_authorized_user_file(self.path, BLOGGER_SCOPES)
+
+    def _expires_at(self, creds):
+        if creds.expiry is None:
+            return None
+        return creds.expiry.replace(tzinfo=timezone.utc).timestamp()
+
+    def _refresh(self, creds):
+        from google.auth.transport.requests import Request
+        if not creds.refresh_token:
+            raise RuntimeError("token sem refresh_token")
+        creds.refresh(Request())
+        return creds
+
+    def _dump(self, creds):
+        return creds.to_json()
+
+    def _token(self, creds):
+        return creds.token
+
+
+class LinkedInToken(CachedToken):
+    name = "linkedin"
+
+    def _load(self):
+        seed = get_env("LINKEDIN_ACCESS_TOKEN")
+        # o cache guarda o hash do token que o semeou: renovações trocam o access_token, mas
+        # só um LINKEDIN_ACCESS_TOKEN novo (trocado à mão) descarta o cache
+        seed_hash = hashlib.sha256(seed.encode()).hexdigest()[:16] if seed else None
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            if seed_hash is None or data.get("seed") in (None, seed_hash):
+                return data
+            print_log("🔑 LINKEDIN_ACCESS_TOKEN mudou; semeando o cache do LinkedIn de novo.")
+        # primeira execução (ou token trocado): semeia o cache com as variáveis de ambiente
+        expires_at = get_env("LINKEDIN_TOKEN_EXPIRES_AT")
+        data = {
+            "access_token": get_env("LINKEDIN_ACCESS_TOKEN", required=True),
+            "refresh_token": get_env("LINKEDIN_REFRESH_TOKEN"),
+            "expires_at": float(expires_at) if expires_at else None,
+            "seed": seed_hash,
+        }
+        _write_atomic(self.path, json.dumps(data))
+        return data
+
+    def _expires_at(self, data):
+        return data.get("expires_at")
+
+    def _refresh(self, data):
+        if not data.get("refresh_token"):
+            raise RuntimeError("LINKEDIN_REFRESH_TOKEN não definido")
+        resp = get_http_client().post(LINKEDIN_OAUTH_URL, data={
+            "grant_type": "refresh_token",
+            "refresh_token": data["refresh_token"],
+            "client_id": get_env("LINKEDIN_CLIENT_ID", required=True),
+            "client_secret": get_env("LINKEDIN_CLIENT_SECRET", required=True),
+        })
+        if resp.status_code != 200:
+            raise RuntimeError(f"HTTP {resp.status_code}: {resp.text}")
+        body = resp.json()
+        expires_in = body.get("expires_in")
+        return {
+            "access_token": body["access_token"],
+            "refresh_token": body.get("refresh_token", data["refresh_token"]),
+            # sem expires_in, validade desconhecida: renova quando a API recusar
+            "expires_at": time.time() + int(expires_in) if expires_in else None,
+            "seed": data.get("seed"),
+        }
+
+    def _dump(self, data):
+        return json.dumps(data)
+
+    def _token(self, data):
+        return data["access_token"]
+
+
+def _provider(cls, path):
+    margin = float(get_env("TOKEN_REFRESH_MARGIN", "900"))
+    key = (cls.name, os.path.abspath(path))
+    with _providers_lock:
+        if key not in _providers:
+            _providers[key] = cls(path, margin)
+        return _providers[key]
+
+
+def get_blogger_credentials(token_file):
+    if not os.path.exists(token_file):
+        print_log(f"❌ Token file '{token_file}' não encontrado; abortando.")
+        sys.exit(1)
+    return _provider(BloggerToken, token_file).get()
+
+
+def get_blogger_service(token_file):
+    from googleapiclient.discovery import build
+    creds = get_blogger_credentials(token_file)
+    return build("blogger", "v3", credentials=creds, cache_discovery=False)
+
+
+def get_linkedin_token():
+    token_file = get_env("LINKEDIN_TOKEN_FILE", "acesso/linkedin_token.json")
+    return _provider(LinkedInToken, token_file).get()["access_token"]
+
+
+def refresh_linkedin_token(rejected):
+    """Renova o token que o LinkedIn recusou (401) e devolve o novo access_token."""
+    token_file = get_env("LINKEDIN_TOKEN_FILE", "acesso/linkedin_token.json")
+    return _provider(LinkedInToken, token_file).refresh(rejected=rejected)["access_token"]
+
+
+_report_registered = False
+
+def _register_report():
+    global _report_registered
+    if not _report_registered:
+        atexit.register(print_credential_stats)
+        _report_registered = True
+
+
+def print_credential_stats():
+    for name, st in CREDENTIAL_STATS.items():
+        if st["refreshes"] or st["failures"]:
+            lat = st["latencies"]
+            avg = sum(lat) / len(lat) if lat else 0.0
+            print_log(
+                f"🔑 {name}: {st['refreshes']} renovações (média {avg:.2f}s, máx "
+                f"{max(lat, default=0.0):.2f}s), {st['failures']} falhas"
+            )
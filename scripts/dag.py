@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+dag.py
+Executor mínimo de grafo de dependências para os agentes.
+
+Cada estágio declara as chaves que consome (inputs) e as que produz (outputs).
+Estágios cujas entradas já estão disponíveis rodam em paralelo num ThreadPoolExecutor,
+de forma que ramos independentes se sobrepõem e o tempo total cai para a cadeia mais longa.
+Ao final de cada execução é impresso um Gantt em texto com início/fim de cada estágio
+e o caminho crítico.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from utils import get_env, print_log
+
+
+class Stage:
+    """Um nó do grafo: `func(**inputs)` devolve um valor (1 output) ou uma tupla (N outputs)."""
+
+    def __init__(self, name, func, inputs=(), outputs=()):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+
+    def run(self, context):
+        kwargs = {k: context[k] for k in self.inputs}
+        result = self.func(**kwargs)
+        if not self.outputs:
+            return {}
+        if len(self.outputs) == 1:
+            return {self.outputs[0]: result}
+        return dict(zip(self.outputs, result))
+
+
+def _validate(stages, available):
+    producers = {}
+    for stage in stages:
+        for out in stage.outputs:
+            if out in producers:
+                raise ValueError(f"Saída '{out}' produzida por '{producers[out]}' e '{stage.name}'")
+            producers[out] = stage.name
+    for stage in stages:
+        for inp in stage.inputs:
+            if inp not in producers and inp not in available:
+                raise ValueError(f"Estágio '{stage.name}' depende de '{inp}', que nenhum estágio produz")
+    return producers
+
+
+def run_dag(stages, context=None, max_workers=None, title="pipeline"):
+    """Executa os estágios respeitando dependências; devolve (context, timings)."""
+    context = dict(context or {})
+    producers = _validate(stages, context)
+    max_workers = max_workers or int(get_env("DAG_MAX_WORKERS", "4"))
+
+    pending = list(stages)
+    running = {}
+    timings = []
+    t0 = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            ready = [s for s in pending if all(k in context for k in s.inputs)]
+            for stage in ready:
+                pending.remove(stage)
+                start = time.perf_counter() - t0
+                running[pool.submit(stage.run, context)] = (stage, start)
+
+            if not running:
+                nomes = ", ".join(s.name for s in pending)
+                raise RuntimeError(f"Dependências não satisfeitas (ciclo?): {nomes}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                stage, start = running.pop(fut)
+                end = time.perf_counter() - t0
+                timings.append((stage.name, start, end))
+                # propaga exceções (inclusive SystemExit dos agentes) para quem chamou
+                context.update(fut.result())
+
+    print_gantt(timings, stages, producers, title)
+    return context, timings
+
+
+def critical_path(timings, stages, producers):
+    """Cadeia de dependências com maior soma de durações."""
+    duration = {name: end - start for name, start, end in timings}
+    by_name = {s.name: s for s in stages}
+    best = {}
+
+    def longest(name):
+        if name not in best:
+            deps = {producers[k] for k in by_name[name].inputs if k in producers}
+            prev = max((longest(d) for d in deps), key=lambda p: p[0], default=(0.0, []))
+            best[name] = (prev[0] + duration.get(name, 0.0), prev[1] + [name])
+        return best[name]
+
+    return max((longest(n) for n in duration), key=lambda p: p[0], default=(0.0, []))
+
+
+def print_gantt(timings, stages, producers, title="pipeline", width=50):
+    if not timings:
+        return
+    total = max(end for _, _, end in timings) or 1e-9
+    label = max(len(name) for name, _, _ in timings)
+    print_log(f"⏱️  Gantt de '{title}' (total {total:.2f}s)")
+    for name, start, end in sorted(timings, key=lambda t: t[1]):
+        a = int(start / total * width)
+        b = max(a + 1, int(end / total * width))
+        bar = " " * a + "█" * (b - a) + " " * (width - b)
+        print_log(f"  {name.ljust(label)} |{bar}| {start:7.2f}s → {end:7.2f}s ({end - start:.2f}s)")
+    cp_time, cp_path = critical_path(timings, stages, producers)
+    print_log(f"  caminho crítico: {' → '.join(cp_path)} ({cp_time:.2f}s)")
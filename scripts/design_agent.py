@@ -4,101 +4,75 @@ design_agent.py
 Design Agent: lê o JSON de rascunho em 'rascunho/' que ainda não possui HTML correspondente em 'htmlblog/',
 seleciona o mais antigo, chama o OpenAI SDK para gerar HTML minimalista responsivo,
 com código sempre em <pre><code>, salva no bucket GCS em 'htmlblog/'.
+
+Rascunhos editados depois do HTML (manifesto '<base>.sections.json' mais antigo que o
+rascunho) são re-renderizados seção a seção (html_sections.py): só os tópicos alterados são
+regenerados — via LLM ou localmente com DESIGN_SECTION_MODE=local — e as demais seções
+são reaproveitadas byte a byte.
+
+Todo HTML gravado (novo ou re-renderizado) entra no índice de busca (search_index.py) usado
+para os artigos relacionados.
 """
 
 import json
 import os
 from utils import (
     load_env, get_env, set_gcp_credentials, init_storage_client, init_openai_client,
-    list_blob_names, download_blob_text, upload_blob_text, get_basename, filter_json_blobs, print_log
+    list_blob_names, download_blob_text, upload_blob_text, get_basename, filter_json_blobs, print_log,
+    print_upload_stats, strip_md_fence
 )
-
-CSS_CONTENT = (
-    ":root {"
-    "  --max-width: 800px;"
-    "  --padding: 16px;"
-    "  --font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, Cantarell, 'Open Sans', 'Helvetica Neue', sans-serif;"
-    "  --line-height: 1.6;"
-    "  --heading-color: #232323;"
-    "  --text-color: #222;"
-    "  --background-color: #f9f9f9;"
-    "  --gap: 1em;"
-    "}"
-    "body {"
-    "  margin: 0;"
-    "  padding: 0;"
-    "  font-family: var(--font-family);"
-    "  line-height: var(--line-height);"
-    "  color: var(--text-color);"
-    "  background: var(--background-color);"
-    "  padding: var(--padding);"
-    "}"
-    ".container {"
-    "  max-width: var(--max-width);"
-    "  margin: 0 auto;"
-    "}"
-    "h1, h2 {"
-    "  color: var(--heading-color);"
-    "  margin-bottom: calc(var(--gap) / 2);"
-    "  text-align: left;"
-    "}"
-    "h1 { font-size: 1.75em; margin-top: var(--gap); }"
-    "h2 { font-size: 1.25em; margin-top: var(--gap); }"
-    "p { margin-bottom: var(--gap); text-align: left; }"
-    "pre, code { background: #ededed; color: #333; border-radius: 8px; padding: 4px 8px; }"
-    "@media (max-width: 600px) {"
-    "  body { padding: 8px; }"
-    "  h1 { font-size: 1.35em; }"
-    "  h2 { font-size: 1.1em; }"
-    "}"
+from html_sections import (
+    MANIFEST_SUFFIX, annotate_sections, section_hashes, draft_hash, splice_sections,
+    render_section_local, load_manifest, save_manifest
 )
+from search_index import index_article
+from rate_limit import set_usage_context
+from prompts import build_messages
+from profiling import run_profiled
 
 def build_prompt(theme, topics, draft):
-    # instruções originais, sem alterações
-    header = (
-        """CONTEXT:
-You are a content formatter for educational blogs in Statistics, Machine Learning, and AI. Your task is to generate a complete, responsive HTML5 document with a minimalist, readable design on any device.
-
-RULES:
-1. Begin output with <!DOCTYPE html>.
-2. Include <html>, <head>, and <body> tags.
-3. In <head>, include:
-   - <meta charset="UTF-8">
-   - <meta name="viewport" content="width=device-width, initial-scale=1.0">
-   - <title> based on the theme
-   - A <style> block with the provided CSS.
-4. In <body>, wrap content in <div class="container">.
-5. Use <h1> for the main theme.
-6. For each topic:
-   - <h2> for the topic title.
-   - <p> for the paragraph content.
-7. Format any code or command examples with <pre><code>…</code></pre>, make sure the code stays inside the code "box"
-8. Use <strong>, <em>, and lists (<ul><li>) to highlight key concepts.
-9. Do not use code fences (```).
-
-OUTPUT:
-Only the complete HTML as specified above, with no extra text.  
-Write all content in Portuguese-BR."""
-    )
-
+    """Mensagens do design: regras + CSS fixos (prompts.DESIGN_SYSTEM); tema e parágrafos como sufixo."""
     lista_topicos = "\n".join(f"- {t}" for t in topics)
     paragrafos = "\n".join(
         f"<h2>{t}</h2>\n<p>{draft['draft'].get(t, '')}</p>"
         for t in topics
     )
 
-    prompt = "\n".join([
-        header,
+    variable = "\n".join([
         f"Tema: {theme}",
         "Tópicos a cobrir:",
         lista_topicos,
-        "Inclua este CSS exatamente na tag <style>:",
-        CSS_CONTENT,
         "Parágrafos já gerados (não reescrever):",
         paragrafos
     ])
 
-    return prompt
+    return build_messages("design", variable)
+
+def design_request(model, draft_data):
+    """Corpo da chamada chat.completions — o mesmo no modo online e no modo batch."""
+    theme  = draft_data.get('theme')
+    topics = draft_data.get('topics', [])
+    return {"model": model, "messages": build_prompt(theme, topics, draft_data)}
+
+def save_html(client, bucket, html_folder, base, html_content, draft_data=None):
+    """Grava o HTML; com `draft_data`, delimita as seções e grava o manifesto ao lado."""
+    output_path = f"{html_folder}/{base}.html"
+    annotated = None
+    if draft_data is not None:
+        annotated = annotate_sections(html_content, section_hashes(draft_data))
+    upload_blob_text(client, bucket, output_path, annotated or html_content,
+                     content_type="text/html; charset=utf-8")
+    if draft_data is not None:
+        save_manifest(client, bucket, html_folder, base, draft_data, annotated is not None)
+    return output_path
+
+def update_search_index(client, bucket, base, html_content, draft_data):
+    """Mantém o índice de relacionados em dia; falha aqui não impede o HTML."""
+    try:
+        index_article(client, bucket, base, html_content,
+                      [draft_data.get("theme", "")] + list(draft_data.get("topics", [])))
+    except Exception as e:
+        print_log(f"⚠️ {base}: índice de busca não atualizado ({e}).")
 
 def find_pending_rascunhos(rascunhos, htmls):
     rasc_map = {os.path.splitext(get_basename(r))[0]: r for r in rascunhos}
@@ -109,6 +83,72 @@ def find_pending_rascunhos(rascunhos, htmls):
     pending = sorted(k for k in rasc_map if k not in html_keys)
     return [rasc_map[k] for k in pending]
 
+def find_edited_rascunhos(client, bucket, rasc_folder, html_folder):
+    """Rascunhos gravados depois do manifesto do seu HTML (só metadados da listagem, sem download)."""
+    rascs = {
+        os.path.splitext(get_basename(b.name))[0]: b
+        for b in client.list_blobs(bucket, prefix=f"{rasc_folder}/") if b.name.endswith(".json")
+    }
+    manifests = {
+        get_basename(b.name)[:-len(MANIFEST_SUFFIX)]: b
+        for b in client.list_blobs(bucket, prefix=f"{html_folder}/") if b.name.endswith(MANIFEST_SUFFIX)
+    }
+    return sorted(
+        rascs[base].name for base, m in manifests.items()
+        if base in rascs and rascs[base].updated and m.updated and rascs[base].updated > m.updated
+    )
+
+def render_section_llm(openai_client, model, topic, paragraph):
+    """Uma chamada pequena por seção alterada: só o tópico e o parágrafo vão no prompt."""
+    resp = openai_client.chat.completions.create(
+        model=model,
+        messages=build_messages("design_section", f"Tópico: {topic}\nParágrafo:\n{paragraph}"),
+    )
+    content = strip_md_fence(resp.choices[0].message.content.strip())
+    start = content.lower().find("<h2")
+    return content[start:] if start != -1 else content
+
+def generate_full(openai_client, model, draft_data):
+    request = design_request(model, draft_data)
+    print_log("Prompt para OpenAI construído. Chamando OpenAI...")
+    resp = openai_client.chat.completions.create(**request)
+    return resp.choices[0].message.content.strip()
+
+def rerender_edited(client, bucket, openai_client, model, html_folder, target, mode):
+    """Atualiza o HTML de um rascunho editado regenerando apenas as seções alteradas."""
+    base = os.path.splitext(get_basename(target))[0]
+    set_usage_context(article=base)
+    draft_data = json.loads(download_blob_text(client, bucket, target))
+    manifest = load_manifest(client, bucket, html_folder, base)
+    if manifest is None:
+        return
+    if manifest.get("draft_hash") == draft_hash(draft_data):
+        # regravado sem mudança de conteúdo: só atualiza o manifesto para não reavaliar
+        save_manifest(client, bucket, html_folder, base, draft_data, manifest.get("sections") is not None)
+        print_log(f"↷ {base}: rascunho regravado sem alterações.")
+        return
+
+    html_path = f"{html_folder}/{base}.html"
+    current = download_blob_text(client, bucket, html_path)
+    result = None
+    if manifest.get("sections") is not None and manifest.get("theme") == draft_data.get("theme"):
+        if mode == "local":
+            render = render_section_local
+        else:
+            render = lambda topic, paragraph: render_section_llm(openai_client, model, topic, paragraph)
+        result = splice_sections(current, draft_data, render)
+
+    if result is None:
+        print_log(f"🔁 {base}: tema alterado ou HTML sem seções; regenerando o documento inteiro.")
+        html_content = generate_full(openai_client, model, draft_data)
+        save_html(client, bucket, html_folder, base, html_content, draft_data)
+        update_search_index(client, bucket, base, html_content, draft_data)
+        return
+    html_content, reused, rendered = result
+    save_html(client, bucket, html_folder, base, html_content, draft_data)
+    update_search_index(client, bucket, base, html_content, draft_data)
+    print_log(f"✅ {base}: {rendered} seções regeneradas ({mode}), {reused} reaproveitadas → gs://{bucket}/{html_path}")
+
 def main():
     print_log("=== Iniciando design_agent ===")
 
@@ -120,6 +160,7 @@ def main():
     RASCUNHO_FOLDER = get_env("RASCUNHO_FOLDER", "rascunho")
     HTML_FOLDER     = get_env("HTML_FOLDER", "htmlblog")
     OPENAI_MODEL    = get_env("OPENAI_MODEL", "gpt-4.1")
+    SECTION_MODE    = get_env("DESIGN_SECTION_MODE", "llm")
 
     print_log("Configurando credenciais GCP e clientes...")
     set_gcp_credentials(AUTH_JSON_PATH)
@@ -132,36 +173,31 @@ def main():
     print_log(f"→ {len(rascs)} rascunhos, {len(htmls)} HTMLs já existentes.")
 
     pendings = find_pending_rascunhos(rascs, htmls)
-    if not pendings:
+    if pendings:
+        target = pendings[0]
+        print_log(f"📄 Processando rascunho: {target}")
+        set_usage_context(article=os.path.splitext(get_basename(target))[0])
+        draft_data = json.loads(download_blob_text(client, bucket, target))
+
+        theme  = draft_data.get('theme')
+        topics = draft_data.get('topics', [])
+        if not theme or not topics:
+            print_log("❌ Rascunho sem 'theme' ou 'topics' – abortando.")
+            return
+
+        html_content = generate_full(openai_client, OPENAI_MODEL, draft_data)
+        base = os.path.splitext(get_basename(target))[0]
+        output_path = save_html(client, bucket, HTML_FOLDER, base, html_content, draft_data)
+        print_log(f"✅ HTML gerado e salvo em gs://{bucket}/{output_path}")
+        update_search_index(client, bucket, base, html_content, draft_data)
+    else:
         print_log("🔍 Nenhum rascunho pendente para gerar HTML.")
-        return
 
-    target = pendings[0]
-    print_log(f"📄 Processando rascunho: {target}")
-    draft_data = json.loads(download_blob_text(client, bucket, target))
-
-    theme  = draft_data.get('theme')
-    topics = draft_data.get('topics', [])
-    if not theme or not topics:
-        print_log("❌ Rascunho sem 'theme' ou 'topics' – abortando.")
-        return
-
-    prompt = build_prompt(theme, topics, draft_data)
-    print_log("Prompt para OpenAI construído. Chamando OpenAI...")
-    resp = openai_client.chat.completions.create(
-        model=OPENAI_MODEL,
-        messages=[
-            {"role": "system", "content": "You are a highly precise HTML formater. Transform the content in a beautiful blog article. Only output the requested HTML."},
-            {"role": "user",   "content": prompt}
-        ]
-    )
-
-    html_content = resp.choices[0].message.content.strip()
-    base = os.path.splitext(get_basename(target))[0]
-    output_path = f"{HTML_FOLDER}/{base}.html"
-    upload_blob_text(client, bucket, output_path, html_content,
-                     content_type="text/html; charset=utf-8")
-    print_log(f"✅ HTML gerado e salvo em gs://{bucket}/{output_path}")
+    edited = find_edited_rascunhos(client, bucket, RASCUNHO_FOLDER, HTML_FOLDER)
+    for target in edited:
+        print_log(f"✏️ Rascunho editado após o HTML: {target}")
+        rerender_edited(client, bucket, openai_client, OPENAI_MODEL, HTML_FOLDER, target, SECTION_MODE)
+    print_upload_stats()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    run_profiled(main, "design_agent")
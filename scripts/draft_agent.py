@@ -15,15 +15,18 @@ from utils import (
     load_env, get_env, set_gcp_credentials,
     init_storage_client, init_openai_client,
     list_blob_names, download_blob_text, upload_blob_text,
-    print_log
+    print_log, print_upload_stats
 )
+from rate_limit import set_usage_context
+from prompts import build_messages
+from profiling import run_profiled
 
 # --------------------------------------------------------------------------- #
 # Funções utilitárias                                                         #
 # --------------------------------------------------------------------------- #
 
-def pegar_ficha_pendente(client, bucket, pasta_ficha, pasta_rasc):
-    """Retorna (caminho_blob, nome_base) da ficha sem rascunho correspondente."""
+def listar_fichas_pendentes(client, bucket, pasta_ficha, pasta_rasc):
+    """Lista (caminho_blob, nome_base) de todas as fichas sem rascunho, da mais antiga à mais nova."""
     fichas = sorted(
         f for f in list_blob_names(client, bucket, pasta_ficha) if f.endswith(".json")
     )
@@ -31,73 +34,32 @@ def pegar_ficha_pendente(client, bucket, pasta_ficha, pasta_rasc):
         os.path.splitext(os.path.basename(r))[0]
         for r in list_blob_names(client, bucket, pasta_rasc) if r.endswith(".json")
     }
+    pendentes = []
     for caminho in fichas:
         base = os.path.splitext(os.path.basename(caminho))[0]
         if base not in existentes:
-            return caminho, base
-    return None, None
+            pendentes.append((caminho, base))
+    return pendentes
 
 
-def gerar_rascunho_em_uma_chamada(
-    openai_client,
-    model: str,
-    ficha_data: dict,
-) -> dict:
-    """Pede ao modelo que devolva o JSON completo com todos os tópicos escritos."""
+def pegar_ficha_pendente(client, bucket, pasta_ficha, pasta_rasc):
+    """Retorna (caminho_blob, nome_base) da ficha sem rascunho correspondente."""
+    pendentes = listar_fichas_pendentes(client, bucket, pasta_ficha, pasta_rasc)
+    return pendentes[0] if pendentes else (None, None)
 
-    # ----- prompt do sistema (estilo e estrutura) -------------------------- #
-    system_prompt = """
-Você é Victor, coordenador de ML & GenAI na BRLink e especialista em soluções AWS.
-
-Objetivo → escrever um artigo educativo (quase científico) em português do Brasil.
-
-Diretrizes de estilo
-- Tom direto, confiante e didático, porém acessível.
-- Parágrafos curtos (máx. 3 linhas cada) para ritmo fluido.
-- Listas marcadas por hífen (“- ”) quando necessário.
-- Nenhum emoji ou formatação especial (sem **negrito**, _itálico_ ou markdown).
-- Afirme apenas o que for comprovado; evite especulações.
-
-Estrutura recomendada
-1. Título instigante  
-2. Resumo de 1 frase  
-3. Contexto e motivação  
-4. Pergunta central ou hipótese  
-5. Abordagem / método (passo a passo)  
-6. Principais achados (lista)  
-7. Implicações práticas  
-8. Limitações ou contrapartidas  
-9. Próximos passos / chamada à ação  
-10. Referências leves  
-
-Sua tarefa agora:
-Receberá um objeto JSON com os campos
-{
-  "timestamp": "...",
-  "theme": "...",
-  "topics": ["tópico 1", "tópico 2", ...]
-}
-
-Crie um novo objeto JSON mantendo os campos originais **e** acrescentando
-"draft": { "<tópico 1>": "<parágrafo>", "<tópico 2>": "<parágrafo>", ... }
-
-• Escreva um único parágrafo (máx. 3 linhas) para cada tópico seguindo as diretrizes acima.  
-• Retorne **apenas** o JSON válido (sem texto extra, cabeçalhos ou markdown).  
-"""
 
+def montar_requisicao_rascunho(model: str, ficha_data: dict) -> dict:
+    """Corpo da chamada chat.completions — o mesmo no modo online e no modo batch."""
+    # prefixo estático (estilo e estrutura) em prompts.DRAFT_SYSTEM; a ficha vai como sufixo
     user_message = json.dumps(ficha_data, ensure_ascii=False)
+    return {
+        "model": model,
+        "messages": build_messages("draft", user_message),
+        "temperature": 0.55,
+    }
 
-    print_log("🧑‍💻 Chamando OpenAI para gerar rascunho completo...")
-    resp = openai_client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_message},
-        ],
-        temperature=0.55,
-    )
 
-    raw_answer = resp.choices[0].message.content.strip()
+def interpretar_rascunho(raw_answer: str) -> dict:
     try:
         return json.loads(raw_answer)
     except json.JSONDecodeError:
@@ -106,6 +68,30 @@ Crie um novo objeto JSON mantendo os campos originais **e** acrescentando
         raise
 
 
+def gerar_rascunho_em_uma_chamada(
+    openai_client,
+    model: str,
+    ficha_data: dict,
+) -> dict:
+    """Pede ao modelo que devolva o JSON completo com todos os tópicos escritos."""
+    print_log("🧑‍💻 Chamando OpenAI para gerar rascunho completo...")
+    resp = openai_client.chat.completions.create(
+        **montar_requisicao_rascunho(model, ficha_data)
+    )
+    return interpretar_rascunho(resp.choices[0].message.content.strip())
+
+
+def salvar_rascunho(client, bucket, pasta_rasc, base, rascunho: dict) -> str:
+    destino = f"{pasta_rasc}/{base}.json"
+    upload_blob_text(
+        client,
+        bucket,
+        destino,
+        json.dumps(rascunho, ensure_ascii=False, indent=2),
+    )
+    return destino
+
+
 # --------------------------------------------------------------------------- #
 # Pipeline principal                                                          #
 # --------------------------------------------------------------------------- #
@@ -133,6 +119,7 @@ def main():
         return
 
     print_log(f"📄 Ficha selecionada: {caminho}")
+    set_usage_context(article=base)
     ficha_raw   = download_blob_text(client, bucket, caminho)
     ficha_data  = json.loads(ficha_raw)
 
@@ -142,15 +129,10 @@ def main():
     )
 
     # --- grava rascunho ------------------------------------------ #
-    destino = f"{RASC_FOLDER}/{base}.json"
-    upload_blob_text(
-        client,
-        bucket,
-        destino,
-        json.dumps(rascunho_completo, ensure_ascii=False, indent=2),
-    )
+    destino = salvar_rascunho(client, bucket, RASC_FOLDER, base, rascunho_completo)
     print_log(f"✅ Rascunho salvo em gs://{BUCKET}/{destino}")
+    print_upload_stats()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    run_profiled(main, "draft_agent")
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+fake_openai_batch.py
+Servidor HTTP local que imita a Batch API da OpenAI (files + batches) para testar
+batch_agent.py sem custo. Cada batch é concluído na primeira consulta, com respostas
+sintéticas: rascunhos recebem um parágrafo por tópico e designs um HTML mínimo.
+
+Também responde a /v1/chat/completions (com atraso opcional FAKE_CHAT_DELAY, em segundos),
+para servir de backend local ao roteador de modelos.
+
+Uso:
+    python3 fake_openai_batch.py 8765
+    OPENAI_BASE_URL=http://localhost:8765/v1 OPENAI_API_KEY=fake python3 batch_agent.py
+"""
+
+import json
+import os
+import sys
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FILES = {}
+BATCHES = {}
+
+
+def _fake_completion(body):
+    messages = body.get("messages", [])
+    user = messages[-1]["content"] if messages else ""
+    if body.get("temperature") is not None:
+        # rascunho: devolve a ficha com um parágrafo por tópico
+        ficha = json.loads(user)
+        ficha["draft"] = {t: f"Parágrafo sintético sobre {t}." for t in ficha.get("topics", [])}
+        content = json.dumps(ficha, ensure_ascii=False)
+    else:
+        theme = user.splitlines()[0].replace("Tema: ", "") if user else "Tema"
+        content = (
+            f"<!DOCTYPE html><html><head><title>{theme}</title></head>"
+            f"<body><div class=\"container\"><h1>{theme}</h1></div></body></html>"
+        )
+    prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+    return {
+        "id": f"chatcmpl-{time.time_ns()}",
+        "object": "chat.completion",
+        "model": body.get("model"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                     "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                  "total_tokens": prompt_tokens + len(content) // 4},
+    }
+
+
+def _new_file(content, purpose):
+    file_id = f"file-{len(FILES) + 1}"
+    FILES[file_id] = content
+    return {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+            "filename": f"{file_id}.jsonl", "purpose": purpose, "status": "processed"}
+
+
+def _run_batch(batch):
+    out = []
+    for raw in FILES[batch["input_file_id"]].decode("utf-8").splitlines():
+        if raw.strip():
+            req = json.loads(raw)
+            out.append(json.dumps({
+                "id": f"batch_req_{len(out)}",
+                "custom_id": req["custom_id"],
+                "response": {"status_code": 200, "body": _fake_completion(req["body"])},
+                "error": None,
+            }, ensure_ascii=False))
+    batch["output_file_id"] = _new_file(("\n".join(out) + "\n").encode("utf-8"), "batch_output")["id"]
+    batch["status"] = "completed"
+    batch["request_counts"] = {"total": len(out), "completed": len(out), "failed": 0}
+
+
+class Handler(BaseHTTPRequestHandler):
+    def _send(self, payload, status=200, raw=False):
+        data = payload if raw else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream" if raw else "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_POST(self):
+        if self.path == "/v1/files":
+            header = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode()
+            msg = BytesParser(policy=HTTP).parsebytes(header + self._body())
+            fields = {part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+                      for part in msg.iter_parts()}
+            return self._send(_new_file(fields["file"], fields["purpose"].decode()))
+        if self.path == "/v1/chat/completions":
+            # também serve como backend local de chat para testar o roteador (router.py)
+            time.sleep(float(os.getenv("FAKE_CHAT_DELAY", "0")))
+            return self._send(_fake_completion(json.loads(self._body())))
+        if self.path == "/v1/batches":
+            req = json.loads(self._body())
+            batch_id = f"batch_{len(BATCHES) + 1}"
+            BATCHES[batch_id] = {
+                "id": batch_id, "object": "batch", "endpoint": req["endpoint"],
+                "input_file_id": req["input_file_id"], "completion_window": req["completion_window"],
+                "status": "validating", "output_file_id": None, "error_file_id": None,
+                "created_at": int(time.time()), "metadata": req.get("metadata"),
+                "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            }
+            return self._send(BATCHES[batch_id])
+        self._send({"error": {"message": f"rota desconhecida {self.path}"}}, 404)
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        if parts[:2] == ["v1", "batches"] and len(parts) == 3 and parts[2] in BATCHES:
+            batch = BATCHES[parts[2]]
+            if batch["status"] == "validating":
+                _run_batch(batch)
+            return self._send(batch)
+        if parts[:2] == ["v1", "files"] and len(parts) == 4 and parts[3] == "content" and parts[2] in FILES:
+            return self._send(FILES[parts[2]], raw=True)
+        self._send({"error": {"message": f"rota desconhecida {self.path}"}}, 404)
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    print(f"Fake Batch API em http://localhost:{port}/v1")
+    ThreadingHTTPServer(("localhost", port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
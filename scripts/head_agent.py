@@ -4,37 +4,47 @@ head_agent.py
 Head Agent: busca as últimas 5 fichas em 'fichaum/' do bucket GCS em ordem cronológica,
 chama o OpenAI SDK (modelo gpt-4o) para extrair tema e tópicos (JSON puro),
 e salva a nova ficha em um novo arquivo JSON na pasta configurada.
+
+Modo calendário (`--plan K` ou HEAD_PLAN_SIZE=K): pede numa única chamada uma série
+coerente de K fichas, valida e remove duplicatas localmente (contra o histórico e entre si)
+e grava cada uma com timestamps sequenciais — a fila de trabalho dos próximos estágios.
 """
 
 import json
+import os
 import re
-from datetime import datetime
+import sys
+import unicodedata
+from datetime import datetime, timedelta
 from utils import (
     load_env, get_env, set_gcp_credentials, init_storage_client, init_openai_client,
     list_blob_names, download_blob_text, upload_blob_text,
-    filter_json_blobs, sort_by_timestamp, print_log
+    filter_json_blobs, print_log, print_upload_stats, get_basename,
+    load_archive_index, read_archive
 )
+from rate_limit import set_usage_context
+from prompts import build_messages
+from profiling import run_profiled
 
 def fetch_last_jsons(client, bucket, prefix, n=5):
-    names = list_blob_names(client, bucket, prefix)
-    json_blobs = filter_json_blobs(names)
-    json_blobs = sort_by_timestamp(json_blobs)
-    recent = json_blobs[-n:] if len(json_blobs) >= n else json_blobs
-    texts = []
-    for i in range(n):
-        texts.append(download_blob_text(client, bucket, recent[i]) if i < len(recent) else "vazio")
-    return texts
+    names = filter_json_blobs(list_blob_names(client, bucket, prefix))
+    live = {os.path.splitext(get_basename(name))[0]: name for name in names}
+    # fichas de artigos já compactados vêm do arquivo de segmentos (mesmo texto gravado)
+    index = load_archive_index(client, bucket)
+    recent = sorted(set(live) | set(index["entries"]))[-n:]
+    archived = {
+        r["id"]: r.get("ficha")
+        for r in read_archive(client, bucket, [i for i in recent if i not in live], index)
+    }
+    texts = [download_blob_text(client, bucket, live[i]) if i in live else archived.get(i) for i in recent]
+    texts = [t for t in texts if t]
+    return texts + ["vazio"] * (n - len(texts))
 
 def build_prompt(json_texts):
+    """Mensagens do head: instruções fixas (prompts.py) + histórico de artigos como sufixo."""
     # se for o primeiro post
     if all(x == "vazio" for x in json_texts):
-        return (
-            "Você está criando o primeiro post de um blog educacional focado em tecnologia, estatística e inteligência artificial. "
-            "Gere um tema principal para o primeiro artigo e sugira cinco tópicos que devem ser abordados neste post de abertura — "
-            "garantindo que o quinto tópico seja uma conclusão clara que resuma o artigo. "
-            "Retorne SOMENTE um objeto JSON com as chaves 'theme' e 'topics' (uma lista de 5 itens, onde o último item é a conclusão). "
-            "Sem explicações ou markdown, apenas JSON válido."
-        )
+        return build_messages("head_first", "Ainda não há artigos publicados no blog.")
 
     artigos = [
         f"Artigo {i+1}: {json_texts[i]}"
@@ -42,19 +52,81 @@ def build_prompt(json_texts):
         if json_texts[i] != "vazio"
     ]
     bloco = "\n\n".join(artigos)
+    return build_messages("head", f"Últimos artigos do blog:\n\n{bloco}")
 
-    return (
-        "Você é um especialista em machine learning e inteligência artificial, coordenador de um time que desenvolve projetos de IA utilizando AWS e editor de um blog de tecnologia, estatística e inteligência artificial."
-        "Analise a ordem cronológica dos últimos artigos do seu blog (do mais antigo ao mais recente) abaixo:\n\n"
-        f"{bloco}\n\n"
-        "Com base nisso, sugira um novo tema relevante para o próximo artigo e proponha cinco tópicos novos e envolventes — Seu publico alvo são profissionais de tecnologia, estatística e IA. Porem o conteúdo deve ser acessível a iniciantes e empreendedores."
-        "Os artigos devem ter caracter educativo, com foco na parte matemática e estatística, mas também com aplicações práticas em IA e machine learning."
-        "O artigo deve ter uma apresentação clara e objetiva, falar sobre as vantegens e desvantagens de cada abordagem, e incluir exemplos práticos."
-        "O quinto tópico deve ser uma conclusão que resuma o artigo e ofereça uma visão geral do tema."
-        "Responda SOMENTE com um objeto JSON contendo 'theme' (string) e 'topics' (lista de 5 strings, "
-        "com a última string sendo a conclusão). Sem markdown, apenas JSON."
+def build_plan_prompt(json_texts, k):
+    """Mensagens do modo calendário: instruções fixas + histórico e tamanho da série como sufixo."""
+    artigos = [f"Artigo {i+1}: {t}" for i, t in enumerate(json_texts) if t != "vazio"]
+    bloco = "\n\n".join(artigos) if artigos else "Ainda não há artigos publicados no blog."
+    return build_messages(
+        "head_plan",
+        f"Últimos artigos do blog:\n\n{bloco}\n\nQuantidade de artigos na série: {k}"
     )
 
+def normalize_theme(theme):
+    """Chave de comparação: sem acentos, minúsculas, só letras/dígitos separados por espaço."""
+    text = unicodedata.normalize("NFKD", theme).encode("ascii", "ignore").decode()
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+def validate_series(data, json_texts, k):
+    """Filtra a série: formato válido, 5 tópicos, sem tema repetido no histórico ou na própria série."""
+    vistos = set()
+    for t in json_texts:
+        if t != "vazio":
+            try:
+                vistos.add(normalize_theme(json.loads(t).get("theme", "")))
+            except (ValueError, AttributeError):
+                continue
+
+    fichas = []
+    series = (data.get("series") or []) if isinstance(data, dict) else []
+    for item in series:
+        theme = item.get("theme") if isinstance(item, dict) else None
+        topics = item.get("topics") if isinstance(item, dict) else None
+        if not isinstance(theme, str) or not theme.strip():
+            print_log(f"⚠️ Item sem 'theme' válido descartado: {item}")
+            continue
+        if (not isinstance(topics, list) or len(topics) != 5
+                or not all(isinstance(t, str) and t.strip() for t in topics)):
+            print_log(f"⚠️ '{theme}' descartado: 'topics' precisa ter 5 strings.")
+            continue
+        chave = normalize_theme(theme)
+        if chave in vistos:
+            print_log(f"⚠️ '{theme}' descartado: tema duplicado.")
+            continue
+        vistos.add(chave)
+        fichas.append({"theme": theme.strip(), "topics": [t.strip() for t in topics]})
+    return fichas[:k]
+
+def plan_series(client, bucket, openai_client, model, folder, k, history):
+    """Gera, valida e grava K fichas sequenciais a partir de uma única chamada."""
+    inicio = datetime.utcnow()
+    set_usage_context(article=f"plano_{inicio.strftime('%Y%m%d_%H%M%S')}")
+    print_log(f"🗓️ Planejando série de {k} fichas em uma chamada...")
+    resp = openai_client.chat.completions.create(
+        model=model,
+        messages=build_plan_prompt(history, k)
+    )
+    conteudo = strip_md_fence(resp.choices[0].message.content.strip())
+    try:
+        data = json.loads(conteudo)
+    except Exception:
+        print_log("ERRO: JSON inválido. Resposta crua abaixo e não será salva:")
+        print_log(conteudo)
+        return []
+
+    fichas = validate_series(data, history, k)
+    print_log(f"→ {len(fichas)} de {k} fichas válidas após validação e deduplicação.")
+    salvas = []
+    for i, ficha in enumerate(fichas):
+        # timestamps sequenciais preservam a ordem da série para draft/design
+        timestamp = (inicio + timedelta(seconds=i)).strftime("%Y%m%d_%H%M%S")
+        filename = f"{folder}/{timestamp}.json"
+        upload_blob_text(client, bucket, filename, json.dumps(ficha, ensure_ascii=False, indent=2))
+        print_log(f"✅ Ficha {i + 1}/{len(fichas)} salva em gs://{bucket}/{filename}: {ficha['theme']}")
+        salvas.append(filename)
+    return salvas
+
 def strip_md_fence(text):
     text = text.strip()
     text = re.sub(r"^```[a-z]*\s*", "", text, flags=re.IGNORECASE)
@@ -70,6 +142,14 @@ def main():
     AUTH_JSON    = get_env("AUTH_JSON_PATH")
     FICHA_FOLDER = get_env("FICHAUM_FOLDER", "fichaum")
     OPENAI_MODEL = get_env("OPENAI_MODEL", "gpt-4o")
+    PLAN_SIZE    = int(get_env("HEAD_PLAN_SIZE", "1"))
+    if "--plan" in sys.argv:
+        pos = sys.argv.index("--plan") + 1
+        value = sys.argv[pos] if pos < len(sys.argv) else ""
+        if not value.isdigit() or int(value) < 1:
+            print_log(f"❌ --plan exige um número de fichas (ex.: --plan 20); recebido: '{value}'")
+            sys.exit(1)
+        PLAN_SIZE = int(value)
 
     print_log("Configurando credenciais GCP e clientes...")
     set_gcp_credentials(AUTH_JSON)
@@ -77,18 +157,25 @@ def main():
     openai_client = init_openai_client()
 
     print_log(f"Buscando últimas fichas em '{FICHA_FOLDER}'...")
-    last_jsons = fetch_last_jsons(client, bucket, FICHA_FOLDER, n=5)
+    # o calendário deduplica contra um histórico maior que o da ficha avulsa
+    historico = int(get_env("HEAD_PLAN_HISTORY", "10")) if PLAN_SIZE > 1 else 5
+    last_jsons = fetch_last_jsons(client, bucket, FICHA_FOLDER, n=historico)
     existentes = len([x for x in last_jsons if x != "vazio"])
     print_log(f"{existentes} fichas encontradas; criando prompt...")
 
-    prompt = build_prompt(last_jsons)
+    if PLAN_SIZE > 1:
+        plan_series(client, bucket, openai_client, OPENAI_MODEL, FICHA_FOLDER, PLAN_SIZE, last_jsons)
+        print_upload_stats()
+        return
+
+    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    set_usage_context(article=timestamp)
+
+    messages = build_prompt(last_jsons)
     print_log("Prompt construído. Chamando OpenAI...")
     resp = openai_client.chat.completions.create(
         model=OPENAI_MODEL,
-        messages=[
-            {"role": "system", "content": "Você é um assistente que identifica o tema e tópicos de artigos para um blog de tecnologia, estatística e IA."},
-            {"role": "user",   "content": prompt}
-        ]
+        messages=messages
     )
 
     conteudo = resp.choices[0].message.content.strip()
@@ -102,10 +189,10 @@ def main():
         print_log(conteudo)
         return
 
-    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     filename = f"{FICHA_FOLDER}/{timestamp}.json"
     upload_blob_text(client, bucket, filename, json.dumps(data, ensure_ascii=False, indent=2))
     print_log(f"✅ Nova ficha salva em gs://{bucket}/{filename}")
+    print_upload_stats()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    run_profiled(main, "head_agent")
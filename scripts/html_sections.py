@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+html_sections.py
+Re-renderização incremental do HTML do design_agent, seção a seção.
+
+Cada tópico do rascunho vira uma seção (<h2> + conteúdo) delimitada no HTML por
+`<!--secao:<hash>-->` … `<!--/secao-->`, onde o hash cobre tópico + parágrafo. Ao lado de cada
+'htmlblog/<base>.html' fica o manifesto '<base>.sections.json' com o tema, o hash do
+rascunho inteiro e os hashes por seção.
+
+Quando um rascunho é editado, só as seções cujo hash mudou são regeneradas; as demais são
+reaproveitadas byte a byte e o documento é remontado (prefixo + seções + sufixo).
+"""
+
+import hashlib
+import html
+import json
+import re
+from datetime import datetime
+from utils import download_blob_text, upload_blob_text, print_log
+
+SECTION_RE = re.compile(r"<!--secao:(\w+)-->(.*?)<!--/secao-->", re.DOTALL)
+H2_RE = re.compile(r"(?:<section[^>]*>\s*)?<h2[\s>]", re.IGNORECASE)
+MANIFEST_SUFFIX = ".sections.json"
+
+
+def section_hash(topic, paragraph):
+    return hashlib.sha256(f"{topic}\n{paragraph}".encode("utf-8")).hexdigest()[:16]
+
+
+def draft_hash(draft_data):
+    """Hash do que o HTML depende: tema, ordem dos tópicos e parágrafos."""
+    payload = json.dumps(
+        [draft_data.get("theme"), draft_data.get("topics", []), draft_data.get("draft", {})],
+        ensure_ascii=False, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def section_hashes(draft_data):
+    paragraphs = draft_data.get("draft", {})
+    return [section_hash(t, paragraphs.get(t, "")) for t in draft_data.get("topics", [])]
+
+
+def manifest_path(html_folder, base):
+    return f"{html_folder}/{base}{MANIFEST_SUFFIX}"
+
+
+def annotate_sections(html_content, hashes):
+    """
+    Delimita as seções de um HTML gerado pelo LLM. Cada seção vai do seu <h2> até o próximo
+    (a última, até o fechamento do container). Retorna None se o número de <h2> não bate
+    com o de tópicos — nesse caso o artigo não tem re-renderização incremental.
+    """
+    if SECTION_RE.search(html_content):
+        return html_content
+    starts = [m.start() for m in H2_RE.finditer(html_content)]
+    if len(starts) != len(hashes):
+        return None
+    body_end = html_content.lower().rfind("</body>")
+    end = html_content.lower().rfind("</div>", starts[-1], body_end if body_end != -1 else None)
+    if end == -1:
+        end = body_end if body_end != -1 else len(html_content)
+    bounds = starts + [end]
+
+    out = [html_content[:starts[0]]]
+    for i, h in enumerate(hashes):
+        block = html_content[bounds[i]:bounds[i + 1]]
+        trailing = block[len(block.rstrip()):]
+        out.append(f"<!--secao:{h}-->{block.rstrip()}<!--/secao-->{trailing}")
+    out.append(html_content[end:])
+    return "".join(out)
+
+
+def split_sections(html_content):
+    """Retorna (prefixo, [(hash, bloco)], separadores, sufixo) de um HTML anotado."""
+    matches = list(SECTION_RE.finditer(html_content))
+    if not matches:
+        return None
+    prefix = html_content[:matches[0].start()]
+    suffix = html_content[matches[-1].end():]
+    blocks = [(m.group(1), m.group(2)) for m in matches]
+    separators = [html_content[a.end():b.start()] for a, b in zip(matches, matches[1:])]
+    return prefix, blocks, separators, suffix
+
+
+def splice_sections(html_content, draft_data, render):
+    """
+    Remonta o documento para o rascunho atual. `render(topic, paragraph)` gera o HTML de uma
+    seção nova ou alterada. Retorna (html, reaproveitadas, regeneradas) ou None se o HTML
+    não estiver anotado.
+    """
+    parts = split_sections(html_content)
+    if parts is None:
+        return None
+    prefix, blocks, separators, suffix = parts
+    existing = dict(blocks)
+    paragraphs = draft_data.get("draft", {})
+
+    out, reused, rendered = [prefix], 0, 0
+    for i, topic in enumerate(draft_data.get("topics", [])):
+        h = section_hash(topic, paragraphs.get(topic, ""))
+        if h in existing:
+            block = existing[h]
+            reused += 1
+        else:
+            block = render(topic, paragraphs.get(topic, "")).strip()
+            rendered += 1
+        if i:
+            out.append(separators[i - 1] if i - 1 < len(separators) else "\n")
+        out.append(f"<!--secao:{h}-->{block}<!--/secao-->")
+    out.append(suffix)
+    return "".join(out), reused, rendered
+
+
+def render_section_local(topic, paragraph):
+    """Renderização determinística (sem LLM): <h2> + <p>/<ul> a partir do texto do rascunho."""
+    out, items = [f"<h2>{html.escape(topic)}</h2>"], []
+    for line in paragraph.splitlines():
+        line = line.strip()
+        if line.startswith("- "):
+            items.append(f"<li>{html.escape(line[2:])}</li>")
+            continue
+        if items:
+            out.append("<ul>" + "".join(items) + "</ul>")
+            items = []
+        if line:
+            out.append(f"<p>{html.escape(line)}</p>")
+    if items:
+        out.append("<ul>" + "".join(items) + "</ul>")
+    return "\n".join(out)
+
+
+def load_manifest(client, bucket, html_folder, base):
+    try:
+        return json.loads(download_blob_text(client, bucket, manifest_path(html_folder, base)))
+    except Exception:
+        return None
+
+
+def save_manifest(client, bucket, html_folder, base, draft_data, annotated):
+    manifest = {
+        "theme": draft_data.get("theme"),
+        "draft_hash": draft_hash(draft_data),
+        # None: HTML sem seções identificáveis → qualquer edição regenera o documento inteiro
+        "sections": [
+            {"topic": t, "hash": h} for t, h in zip(draft_data.get("topics", []), section_hashes(draft_data))
+        ] if annotated else None,
+        "rendered_at": datetime.utcnow().isoformat(),
+    }
+    upload_blob_text(client, bucket, manifest_path(html_folder, base),
+                     json.dumps(manifest, ensure_ascii=False, indent=2))
+    if not annotated:
+        print_log(f"⚠️ {base}: <h2> não correspondem aos tópicos; edições futuras regeneram o HTML inteiro.")
+    return manifest
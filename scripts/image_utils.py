@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+image_utils.py
+Variantes responsivas da capa: decodifica a imagem do DALL·E uma única vez e gera
+WebP + JPEG em várias larguras (qualidade ajustável), uma miniatura para o upload
+do LinkedIn, faz o upload com Cache-Control longo e monta o bloco <picture>/srcset.
+O PNG original fica guardado ('{base}.png', privado) para regerar as variantes sem perda.
+"""
+
+import html
+import io
+from PIL import Image
+from utils import get_env, print_log, upload_blob_bytes
+
+# imutáveis: o nome do arquivo muda a cada artigo
+COVER_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def cover_settings():
+    widths = get_env("COVER_WIDTHS", "480,768,1024,1792")
+    return {
+        "widths": sorted({int(w) for w in widths.split(",") if w.strip()}),
+        "webp_quality": int(get_env("COVER_WEBP_QUALITY", "78")),
+        "jpeg_quality": int(get_env("COVER_JPEG_QUALITY", "82")),
+        "thumb_width": int(get_env("COVER_THUMB_WIDTH", "1200")),
+        "cache_control": get_env("COVER_CACHE_CONTROL", COVER_CACHE_CONTROL),
+    }
+
+
+def _resize(img, width):
+    if width >= img.width:
+        return img
+    height = round(img.height * width / img.width)
+    return img.resize((width, height), Image.LANCZOS)
+
+
+def _encode(img, fmt, quality):
+    buf = io.BytesIO()
+    if fmt == "webp":
+        img.save(buf, "WEBP", quality=quality, method=6)
+    else:
+        img.save(buf, "JPEG", quality=quality, optimize=True, progressive=True)
+    return buf.getvalue()
+
+
+def build_cover_variants(image_data, settings):
+    """
+    Retorna (variantes, miniatura). Cada variante é um dict com
+    width, height, format, content_type e data.
+    """
+    img = Image.open(io.BytesIO(image_data))
+    img = img.convert("RGB")
+
+    variants = []
+    # maior → menor: cada redução parte da anterior, mais barata que partir do original
+    current = img
+    for width in sorted(settings["widths"], reverse=True):
+        current = _resize(current, width)
+        for fmt, quality, ctype in (
+            ("webp", settings["webp_quality"], "image/webp"),
+            ("jpg", settings["jpeg_quality"], "image/jpeg"),
+        ):
+            variants.append({
+                "width": current.width,
+                "height": current.height,
+                "format": fmt,
+                "content_type": ctype,
+                "data": _encode(current, fmt, quality),
+            })
+
+    thumb = _encode(_resize(img, settings["thumb_width"]), "jpg", settings["jpeg_quality"])
+    variants.sort(key=lambda v: (v["format"], v["width"]))
+    return variants, thumb
+
+
+def cover_original_path(folder, base_name):
+    return f"{folder}/{base_name}.png"
+
+
+def cover_claim_path(folder, base_name):
+    """Marca do cover_agent.py enquanto gera a capa: quem chega depois espera em vez de gerar outra."""
+    return f"{folder}/{base_name}.cover-pending"
+
+
+def upload_cover_original(bucket, folder, base_name, image_data):
+    """
+    Guarda o PNG original do DALL·E (privado): variantes refeitas depois (cover_backfill.py)
+    partem dele, e não do '{base}.jpg' já comprimido.
+    """
+    upload_blob_bytes(bucket.client, bucket.name, cover_original_path(folder, base_name),
+                      image_data, "image/png")
+
+
+def upload_cover_variants(bucket, folder, base_name, variants, thumb, cache_control):
+    """
+    Sobe as variantes como '{base}-{w}.{fmt}', a maior JPEG também como '{base}.jpg'
+    (fallback do <img>) e a miniatura como '{base}_thumb.jpg'. Preenche `url` em cada variante.
+    """
+    def put(path, data, content_type):
+        upload_blob_bytes(bucket.client, bucket.name, path, data, content_type,
+                          cache_control=cache_control, public=True)
+        return bucket.blob(path).public_url
+
+    for v in variants:
+        v["url"] = put(f"{folder}/{base_name}-{v['width']}.{v['format']}", v["data"], v["content_type"])
+
+    largest_jpeg = max((v for v in variants if v["format"] == "jpg"), key=lambda v: v["width"])
+    fallback_url = put(f"{folder}/{base_name}.jpg", largest_jpeg["data"], "image/jpeg")
+    put(f"{folder}/{base_name}_thumb.jpg", thumb, "image/jpeg")
+    return fallback_url
+
+
+def build_picture_html(variants, fallback_url, alt, max_width=800):
+    """Bloco <picture> com um <source> por formato; o navegador escolhe a menor largura suficiente."""
+    sizes = f"(max-width: {max_width}px) 100vw, {max_width}px"
+    sources = []
+    for fmt, ctype in (("webp", "image/webp"), ("jpg", "image/jpeg")):
+        srcset = ", ".join(f"{v['url']} {v['width']}w" for v in variants if v["format"] == fmt)
+        sources.append(f'<source type="{ctype}" srcset="{srcset}" sizes="{sizes}">')
+    largest = max(variants, key=lambda v: v["width"])
+    img = (
+        f'<img src="{fallback_url}" alt="{html.escape(alt, quote=True)}" width="{largest["width"]}" height="{largest["height"]}" '
+        'style="max-width:100%;height:auto;">'
+    )
+    return "<p><picture>" + "".join(sources) + img + "</picture></p>\n"
+
+
+def log_savings(original_size, variants, thumb):
+    """Loga o tamanho de cada variante e a economia frente ao arquivo original."""
+    kb = lambda n: f"{n / 1024:.0f} KB"
+    print_log(f"→ Capa original: {kb(original_size)}")
+    for v in variants:
+        delta = 100 * (len(v["data"]) / original_size - 1) if original_size else 0
+        print_log(f"   {v['format']:>4} {v['width']:>5}w: {kb(len(v['data']))} ({delta:+.0f}%)")
+    smallest = min(variants, key=lambda v: len(v["data"]))
+    print_log(
+        f"→ Economia no celular ({smallest['format']} {smallest['width']}w): "
+        f"{kb(original_size - len(smallest['data']))} por leitura; miniatura LinkedIn: {kb(len(thumb))}"
+    )
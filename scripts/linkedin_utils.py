@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+linkedin_utils.py
+Funções compartilhadas por post_page_linkedin.py e post_person_linkedin.py:
+busca do último HTML/capa no GCS, URL do último post no Blogger, geração do texto
+via OpenAI e chamadas às APIs de Assets e UGC do LinkedIn. Todas as chamadas HTTP usam
+o cliente compartilhado de utils.get_http_client (uma conexão TLS reaproveitada); num 401
+o token é renovado e a chamada repetida uma vez.
+
+`publish_blog_to_linkedin` monta essas etapas como um grafo (dag.py): a geração do
+texto (título + URL) roda em paralelo ao registro e upload do asset da imagem.
+Se a capa ainda estiver em backfill, o compartilhamento é guardado no bucket e
+publicado pelo cover_backfill.py assim que a capa existir.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import re
+from datetime import datetime
+from utils import (
+    get_env, init_openai_client, print_log, download_blob_text, upload_blob_text, get_http_client
+)
+from google.cloud import storage
+from credentials import get_blogger_service, get_linkedin_token, refresh_linkedin_token
+from dag import Stage, run_dag
+from rate_limit import set_usage_context
+from prompts import build_messages
+
+LINKEDIN_API = "https://api.linkedin.com/v2"
+# compartilhamentos adiados: '<backfill>/<base>.linkedin-<sha1(author)>.json'
+PENDING_SHARE_MARK = ".linkedin-"
+
+
+def fetch_latest_article(bucket_name, html_folder, backfill_folder="backfill"):
+    """
+    Retorna (título, bytes_da_capa, base) do HTML mais recente em html_folder.
+    Sem capa mas com backfill pendente (post_blog.py publicou antes da capa ficar pronta),
+    retorna bytes_da_capa = None: o compartilhamento é adiado em vez de falhar.
+    """
+    print_log("Conectando ao GCS...")
+    client_storage = storage.Client()
+    try:
+        bucket = client_storage.get_bucket(bucket_name)
+    except Exception as e:
+        print_log(f"❌ Erro ao acessar bucket: {e}")
+        sys.exit(1)
+    blobs = list(client_storage.list_blobs(bucket_name, prefix=f"{html_folder}/"))
+    htmls = sorted([b.name for b in blobs if b.name.endswith('.html')])
+    if not htmls:
+        print_log("🔍 Nenhum HTML encontrado; abortando.")
+        sys.exit(1)
+    latest_html = htmls[-1]
+    base = os.path.splitext(os.path.basename(latest_html))[0]
+    set_usage_context(article=base)
+    # download HTML título
+    raw_html = download_blob_text(client_storage, bucket_name, latest_html)
+    m = re.search(r"<title>(.*?)</title>", raw_html, re.IGNORECASE|re.DOTALL)
+    post_title = m.group(1).strip() if m else base
+    # imagem: miniatura dimensionada para o LinkedIn; capa cheia como fallback
+    blob_img = bucket.blob(f"{html_folder}/{base}_thumb.jpg")
+    if not blob_img.exists():
+        blob_img = bucket.blob(f"{html_folder}/{base}.jpg")
+    img_path = blob_img.name
+    if not blob_img.exists():
+        if bucket.blob(f"{backfill_folder}/{base}.json").exists():
+            print_log(f"⏳ Capa de {base} ainda pendente; compartilhamento será adiado.")
+            return post_title, None, base
+        print_log(f"❌ Imagem não encontrada: {img_path}")
+        sys.exit(1)
+    image_bytes = blob_img.download_as_bytes()
+    print_log(f"→ HTML: {latest_html}, Título: {post_title}")
+    return post_title, image_bytes, base
+
+
+def fetch_latest_post_url(blogger_token_file, blog_id):
+    print_log("Conectando ao Blogger...")
+    blog_service = get_blogger_service(blogger_token_file)
+    resp = blog_service.posts().list(blogId=blog_id, maxResults=1, orderBy="PUBLISHED").execute()
+    items = resp.get('items', [])
+    if not items:
+        print_log("❌ Nenhum post no Blogger; abortando.")
+        sys.exit(1)
+    post_url = items[0].get('url')
+    print_log(f"→ URL: {post_url}")
+    return post_url
+
+
+def build_post_text_messages(post_title, post_url):
+    # estilo/estrutura fixos em prompts.LINKEDIN_SYSTEM; só título e link variam
+    return build_messages("linkedin", f"Título do artigo: “{post_title}”\nLink: {post_url}")
+
+
+def generate_post_text(chat_model, post_title, post_url):
+    openai_client = init_openai_client()
+
+    chat = openai_client.chat.completions.create(
+        model=chat_model,
+        messages=build_post_text_messages(post_title, post_url),
+        temperature = 0.7          # mais criatividade sem perder coerência
+    )
+
+    post_text = chat.choices[0].message.content.strip()
+    print_log("→ Texto gerado")
+    return post_text
+
+
+def linkedin_request(method, url, linkedin_token, headers, **kwargs):
+    """Chamada autenticada à API; se o token for recusado (401), renova e repete uma vez."""
+    def send(token):
+        return get_http_client().request(method, url, headers={**headers, "Authorization": f"Bearer {token}"},
+                                         **kwargs)
+    resp = send(linkedin_token)
+    if resp.status_code != 401:
+        return resp
+    print_log("🔑 LinkedIn recusou o token (401); renovando e tentando de novo.")
+    try:
+        fresh = refresh_linkedin_token(linkedin_token)
+    except Exception:
+        # falha já registrada pelo credentials.py: segue com o 401 para o tratamento de erro
+        return resp
+    return send(fresh)
+
+
+def register_image_upload(linkedin_token, author):
+    """Registra o asset no LinkedIn; retorna (asset, upload_url)."""
+    print_log("Registrando asset para imagem...")
+    register_payload = {
+        "registerUploadRequest": {
+            "recipes": ["urn:li:digitalmediaRecipe:feedshare-image"],
+            "owner": author,
+            "serviceRelationships": [{
+                "relationshipType": "OWNER",
+                "identifier": "urn:li:userGeneratedContent"
+            }]
+        }
+    }
+    reg_headers = {"Content-Type":"application/json"}
+    reg_resp = linkedin_request("POST", f"{LINKEDIN_API}/assets?action=registerUpload", linkedin_token,
+                                reg_headers, json=register_payload)
+    if reg_resp.status_code != 200:
+        print_log(f"❌ Erro ao registrar upload: {reg_resp.text}")
+        sys.exit(1)
+    upload_info = reg_resp.json()
+    asset = upload_info['value']['asset']
+    upload_url = upload_info['value']['uploadMechanism']['com.linkedin.digitalmedia.uploading.MediaUploadHttpRequest']['uploadUrl']
+    return asset, upload_url
+
+
+def upload_image(linkedin_token, upload_url, image_bytes):
+    print_log("Enviando bytes da imagem...")
+    upload_headers = {"Content-Type": "application/octet-stream"}
+    up_resp = linkedin_request("PUT", upload_url, linkedin_token, upload_headers, content=image_bytes)
+    if up_resp.status_code not in (200,201):
+        print_log(f"❌ Erro no upload da imagem: {up_resp.status_code}")
+        sys.exit(1)
+
+
+def publish_share(linkedin_token, author, post_text, post_title, asset):
+    """Publica o UGC com a imagem já carregada."""
+    post_payload = {
+        "author": author,
+        "lifecycleState": "PUBLISHED",
+        "specificContent": {"com.linkedin.ugc.ShareContent": {
+            "shareCommentary": {"text": post_text},
+            "shareMediaCategory": "IMAGE",
+            "media": [{
+                "status": "READY",
+                "description": {"text": post_title},
+                "media": asset,
+                "title": {"text": post_title}
+            }]
+        }},
+        "visibility": {"com.linkedin.ugc.MemberNetworkVisibility": "PUBLIC"}
+    }
+    print_log("Publicando no LinkedIn...")
+    post_headers = {"X-Restli-Protocol-Version":"2.0.0","Content-Type":"application/json"}
+    post_res = linkedin_request("POST", f"{LINKEDIN_API}/ugcPosts", linkedin_token, post_headers, json=post_payload)
+    if post_res.status_code in (200,201):
+        print_log("✅ Publicado com sucesso!")
+    else:
+        print_log(f"❌ Erro ao publicar: {post_res.text}")
+        sys.exit(1)
+
+
+def pending_share_path(backfill_folder, base, author):
+    digest = hashlib.sha1(author.encode("utf-8")).hexdigest()[:10]
+    return f"{backfill_folder}/{base}{PENDING_SHARE_MARK}{digest}.json"
+
+
+def save_pending_share(bucket_name, backfill_folder, base, author, post_text, post_title, post_url):
+    """Guarda o compartilhamento para o cover_backfill.py publicar quando a capa existir."""
+    record = {
+        "base": base,
+        "author": author,
+        "post_text": post_text,
+        "post_title": post_title,
+        "post_url": post_url,
+        "created_at": datetime.utcnow().isoformat(),
+    }
+    path = pending_share_path(backfill_folder, base, author)
+    upload_blob_text(storage.Client(), bucket_name, path, json.dumps(record, ensure_ascii=False, indent=2))
+    print_log(f"📝 Compartilhamento adiado registrado em gs://{bucket_name}/{path}")
+
+
+def share_with_image(linkedin_token, author, post_text, post_title, image_bytes):
+    """Registro + upload + publicação em sequência (usado pelo backfill)."""
+    asset, upload_url = register_image_upload(linkedin_token, author)
+    upload_image(linkedin_token, upload_url, image_bytes)
+    publish_share(linkedin_token, author, post_text, post_title, asset)
+
+
+def publish_blog_to_linkedin(author, title="linkedin"):
+    """Executa o fluxo completo de publicação para o `author` (URN de página ou pessoa)."""
+    bucket_name        = get_env("BUCKET_NAME", required=True)
+    html_folder        = get_env("HTML_FOLDER", "htmlblog")
+    blogger_token_file = get_env("BLOGGER_TOKEN_FILE", required=True)
+    blog_id            = get_env("BLOG_ID", required=True)
+    chat_model         = get_env("OPENAI_CHAT_MODEL", "gpt-4o")
+    backfill_folder    = get_env("BACKFILL_FOLDER", "backfill")
+    linkedin_token     = get_linkedin_token()
+
+    # sem capa (backfill pendente) não há asset: o texto é gerado e guardado para depois
+    def register(image_bytes):
+        if image_bytes is None:
+            return None, None
+        return register_image_upload(linkedin_token, author)
+
+    def upload(asset, upload_url, image_bytes):
+        if image_bytes is None:
+            return
+        upload_image(linkedin_token, upload_url, image_bytes)
+        print_log(f"→ Imagem carregada: {asset}")
+
+    def publish(post_text, post_title, post_url, base, asset, asset_ready):
+        if asset is None:
+            save_pending_share(bucket_name, backfill_folder, base, author, post_text, post_title, post_url)
+            return
+        publish_share(linkedin_token, author, post_text, post_title, asset)
+
+    stages = [
+        Stage("article",  lambda: fetch_latest_article(bucket_name, html_folder, backfill_folder),
+              outputs=("post_title", "image_bytes", "base")),
+        Stage("post_url", lambda: fetch_latest_post_url(blogger_token_file, blog_id),
+              outputs=("post_url",)),
+        Stage("text",     lambda post_title, post_url: generate_post_text(chat_model, post_title, post_url),
+              inputs=("post_title", "post_url"), outputs=("post_text",)),
+        Stage("register", register, inputs=("image_bytes",), outputs=("asset", "upload_url")),
+        Stage("upload",   upload, inputs=("asset", "upload_url", "image_bytes"),
+              outputs=("asset_ready",)),
+        Stage("publish",  publish,
+              inputs=("post_text", "post_title", "post_url", "base", "asset", "asset_ready")),
+    ]
+    run_dag(stages, title=title)
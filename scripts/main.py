@@ -1,21 +1,32 @@
 #!/usr/bin/env python3
 """
-main.py: Executa head_agent, draft_agent e design_agent em sequência,
-processando um ciclo completo do pipeline (criação de ficha, rascunho e HTML).
+main.py: Executa os agentes do pipeline como um grafo de dependências (dag.py),
+processando um ciclo completo (criação de ficha, rascunho, HTML e publicação).
+Agentes independentes entre si (ex.: capa × rascunho/design, publicações no LinkedIn)
+rodam em paralelo e, ao final, é impresso um Gantt com o tempo de cada etapa.
 Uso: python3 main.py
 """
 
 import subprocess
 import sys
+from dag import Stage, run_dag
+from utils import load_env, get_env
+from profiling import run_profiled
 
+# (script, entradas, saídas) — as chaves representam os artefatos gravados no bucket
 AGENTS = [
-    "head_agent.py",
-    "draft_agent.py",
-    "design_agent.py",
-    "post_blog.py",
-    "post_person_linkedin.py"
+    ("head_agent.py",           (),           ("ficha",)),
+    # a capa só depende do título da ficha: roda em paralelo a rascunho e design
+    ("cover_agent.py",          ("ficha",),   ()),
+    ("draft_agent.py",          ("ficha",),   ("rascunho",)),
+    ("design_agent.py",         ("rascunho",), ("html",)),
+    ("post_blog.py",            ("html",),    ("post_url",)),
+    ("post_person_linkedin.py", ("post_url",), ()),
 ]
 
+# publicado em paralelo ao feed pessoal quando PUBLISH_LINKEDIN_PAGE=1
+PAGE_AGENT = ("post_page_linkedin.py", ("post_url",), ())
+
 def run_agent(script):
     cmd = [sys.executable, script]
     print(f"\n=== Executando: {' '.join(cmd)} ===")
@@ -30,10 +41,19 @@ def run_agent(script):
         print(e.stderr, file=sys.stderr)
         sys.exit(e.returncode)
 
+def build_stages():
+    agents = list(AGENTS)
+    if get_env("PUBLISH_LINKEDIN_PAGE", "0") == "1":
+        agents.append(PAGE_AGENT)
+    return [
+        Stage(script, lambda script=script, **_: run_agent(script), inputs, outputs)
+        for script, inputs, outputs in agents
+    ]
+
 def main():
-    for script in AGENTS:
-        run_agent(script)
+    load_env()
+    run_dag(build_stages(), title="main")
     print("\n✅ Pipeline concluído!")
 
 if __name__ == "__main__":
-    main()
+    run_profiled(main, "main")
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+page_weight.py
+Etapa de peso da página entre clean_html e a publicação no Blogger.
+
+O design_agent embute em cada HTML um <head> com o <style> de prompts.CSS_CONTENT; o post
+publicado carregava a mesma folha de estilo inteira e o markup formatado pelo modelo. Aqui:
+  • o <head>, os <style> e as tags <body> saem do conteúdo;
+  • o CSS vira regras com escopo em `.hub-post` (o conteúdo é envolvido nessa classe, então
+    `body`/`:root` não vazam para o tema do blog). Se o CSS do post é o CSS_CONTENT, ele é
+    servido uma vez só, conforme PAGE_CSS_MODE:
+      link   — folha compartilhada '<PAGE_CSS_FOLDER>/hub-post-<hash>.css' (pública, imutável),
+               referenciada por um <link> que o navegador cacheia entre posts (padrão);
+      theme  — nada no post; cole a saída de `page_weight.py --css` no CSS do tema do Blogger;
+      inline — <style> com escopo e minificado dentro do post.
+    CSS alterado pelo modelo fica inline (com escopo) naquele post;
+  • espaços redundantes, comentários (exceto os marcadores da capa) e atributos vazios ou
+    com valor padrão são removidos — <pre>/<code> ficam intactos.
+Cada post registra os bytes antes e depois.
+
+Uso (relatório, sem publicar nem enviar nada):
+    python3 page_weight.py --last 10    # últimos HTMLs de HTML_FOLDER
+    python3 page_weight.py --css        # folha com escopo para colar no tema
+"""
+
+import hashlib
+import os
+import re
+import sys
+from utils import (
+    load_env, get_env, set_gcp_credentials, init_storage_client, list_blob_names,
+    download_blob_text, upload_blob_bytes, sort_by_timestamp, print_log
+)
+from prompts import CSS_CONTENT
+
+SCOPE_CLASS = "hub-post"
+CSS_MODES = ("link", "theme", "inline")
+
+HEAD_RE = re.compile(r"<head\b[^>]*>.*?</head>", re.IGNORECASE | re.DOTALL)
+STYLE_RE = re.compile(r"<style\b[^>]*>(.*?)</style>", re.IGNORECASE | re.DOTALL)
+BODY_TAG_RE = re.compile(r"</?body\b[^>]*>", re.IGNORECASE)
+# conteúdo onde espaços importam
+PRESERVE_RE = re.compile(r"(<(pre|textarea|script)\b.*?</\2>)", re.IGNORECASE | re.DOTALL)
+# comentários que o pipeline usa (capa substituída pelo cover_backfill.py)
+COMMENT_RE = re.compile(r"<!--(?!/?capa-->).*?-->", re.DOTALL)
+BLOCK_TAGS = (
+    "div|p|h[1-6]|ul|ol|li|section|article|header|footer|nav|main|aside|blockquote|figure|"
+    "figcaption|table|thead|tbody|tfoot|tr|td|th|hr|br|link|meta|style"
+)
+BLOCK_SPACE_RE = re.compile(rf"\s*(</?(?:{BLOCK_TAGS})\b[^>]*>)\s*", re.IGNORECASE)
+REDUNDANT_ATTR_RE = re.compile(
+    r"\s(?:(?:class|id|style|title)=\"\s*\"|type=\"text/(?:css|javascript)\"|"
+    r"method=\"get\"|shape=\"rect\"|frameborder=\"0\")",
+    re.IGNORECASE
+)
+
+
+def minify_css(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r"\s*:\s*", ":", css)
+    return css.replace(";}", "}").strip()
+
+
+def _scope_selector(selector, scope):
+    selector = selector.strip()
+    if selector in (":root", "html", "body"):
+        return scope
+    for root in ("html ", "body ", ":root "):
+        if selector.startswith(root):
+            return f"{scope} {selector[len(root):]}"
+    return f"{scope} {selector}"
+
+
+def _block_end(css, start):
+    """Índice do '}' que fecha o bloco aberto em css[start] == '{'."""
+    depth = 0
+    for i in range(start, len(css)):
+        if css[i] == "{":
+            depth += 1
+        elif css[i] == "}":
+            depth -= 1
+            if depth == 0:
+                return i
+    return len(css)
+
+
+def scope_css(css, scope=f".{SCOPE_CLASS}"):
+    """Prefixa os seletores de um CSS minificado com `scope` (inclusive dentro de @media/@supports)."""
+    out, i = [], 0
+    while i < len(css):
+        brace = css.find("{", i)
+        if brace == -1:
+            break
+        prelude = css[i:brace].strip()
+        end = _block_end(css, brace)
+        body = css[brace + 1:end]
+        if prelude.startswith(("@media", "@supports")):
+            out.append(f"{prelude}{{{scope_css(body, scope)}}}")
+        elif prelude.startswith("@"):
+            # @font-face, @keyframes...: sem seletores
+            out.append(f"{prelude}{{{body}}}")
+        else:
+            selectors = ",".join(_scope_selector(s, scope) for s in prelude.split(","))
+            out.append(f"{selectors}{{{body}}}")
+        i = end + 1
+    return "".join(out)
+
+
+def shared_css():
+    """Folha compartilhada: CSS_CONTENT com escopo e minificado (mesmo conteúdo → mesmo hash)."""
+    return scope_css(minify_css(CSS_CONTENT))
+
+
+def shared_css_path():
+    digest = hashlib.sha256(shared_css().encode("utf-8")).hexdigest()[:10]
+    return f"{get_env('PAGE_CSS_FOLDER', 'theme')}/{SCOPE_CLASS}-{digest}.css"
+
+
+def ensure_shared_stylesheet(client, bucket_name):
+    """Sobe a folha compartilhada (uma vez por versão do CSS) e retorna a URL pública."""
+    path = shared_css_path()
+    upload_blob_bytes(client, bucket_name, path, shared_css().encode("utf-8"),
+                      "text/css; charset=utf-8", public=True)
+    return f"https://storage.googleapis.com/{bucket_name}/{path}"
+
+
+def minify_html(content):
+    """
+    Colapsa espaços, remove comentários e atributos redundantes — só fora de
+    <pre>/<textarea>/<script>, que seguem intactos (o conteúdo deles é literal).
+    """
+    parts = PRESERVE_RE.split(content)
+    out = []
+    # split com 2 grupos: [texto, bloco preservado, nome da tag, texto, ...]
+    for i in range(0, len(parts), 3):
+        text = COMMENT_RE.sub("", parts[i])
+        text = REDUNDANT_ATTR_RE.sub("", text)
+        text = re.sub(r"\s+", " ", text)
+        out.append(BLOCK_SPACE_RE.sub(r"\1", text))
+        if i + 1 < len(parts):
+            out.append(parts[i + 1])
+    return "".join(out).strip()
+
+
+def optimize_post(content, stylesheet_url=None, mode=None):
+    """
+    Retorna (conteúdo, css_compartilhado) — css_compartilhado é True quando o estilo do post
+    foi substituído pela folha compartilhada. `stylesheet_url` só é usado no modo link.
+    """
+    mode = mode or get_env("PAGE_CSS_MODE", "link")
+    if mode not in CSS_MODES:
+        print_log(f"❌ PAGE_CSS_MODE inválido '{mode}' (use {', '.join(CSS_MODES)}).")
+        sys.exit(1)
+
+    styles = [m.group(1) for m in STYLE_RE.finditer(content)]
+    content = HEAD_RE.sub("", content)
+    content = STYLE_RE.sub("", content)
+    content = BODY_TAG_RE.sub("", content)
+
+    css = minify_css("".join(styles))
+    shared = bool(css) and css == minify_css(CSS_CONTENT) and mode != "inline"
+    if css and not shared:
+        if mode != "inline":
+            print_log("⚠️ CSS do post difere do CSS_CONTENT; mantido inline com escopo neste post.")
+        head = f"<style>{scope_css(css)}</style>"
+    elif shared and mode == "link":
+        head = f'<link rel="stylesheet" href="{stylesheet_url}">'
+    else:
+        head = ""
+
+    body = minify_html(content) if get_env("PAGE_MINIFY", "1") == "1" else content.strip()
+    return f'{head}<div class="{SCOPE_CLASS}">{body}</div>', shared
+
+
+def optimize_for_blogger(client, bucket_name, content, label):
+    """optimize_post + folha compartilhada no bucket + relatório de bytes do post."""
+    url = None
+    if get_env("PAGE_CSS_MODE", "link") == "link":
+        url = ensure_shared_stylesheet(client, bucket_name)
+    optimized, shared = optimize_post(content, url)
+    log_weight(label, content, optimized, shared)
+    return optimized
+
+
+def log_weight(label, before, after, shared):
+    b, a = len(before.encode("utf-8")), len(after.encode("utf-8"))
+    where = "folha compartilhada" if shared else "inline"
+    print_log(f"🪶 {label}: {b / 1024:.1f} KB → {a / 1024:.1f} KB ({(a - b) / max(b, 1):+.0%}; CSS {where})")
+    return b, a
+
+
+def main():
+    load_env()
+    if "--css" in sys.argv:
+        print(shared_css())
+        return
+
+    from post_blog import clean_html
+    last = 10
+    if "--last" in sys.argv:
+        pos = sys.argv.index("--last") + 1
+        value = sys.argv[pos] if pos < len(sys.argv) else ""
+        if not value.isdigit() or int(value) < 1:
+            print_log(f"❌ --last exige a quantidade de HTMLs (ex.: --last 10); recebido: '{value}'")
+            sys.exit(1)
+        last = int(value)
+    html_folder = get_env("HTML_FOLDER", "htmlblog")
+    set_gcp_credentials(get_env("AUTH_JSON_PATH"))
+    client, bucket = init_storage_client()
+
+    htmls = sort_by_timestamp([n for n in list_blob_names(client, bucket, html_folder) if n.endswith(".html")])
+    total_before = total_after = 0
+    for path in htmls[-last:]:
+        _, cleaned = clean_html(download_blob_text(client, bucket, path))
+        optimized, shared = optimize_post(cleaned, f"https://storage.googleapis.com/{bucket}/{shared_css_path()}")
+        b, a = log_weight(os.path.splitext(os.path.basename(path))[0], cleaned, optimized, shared)
+        total_before, total_after = total_before + b, total_after + a
+    if total_before:
+        print_log(f"📊 Total: {total_before / 1024:.1f} KB → {total_after / 1024:.1f} KB "
+                  f"({(total_after - total_before) / total_before:+.0%})")
+
+
+if __name__ == "__main__":
+    main()
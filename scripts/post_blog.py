@@ -4,62 +4,56 @@ publish_from_htmlblog_blogger.py
 Lê o último HTML em 'htmlblog/' do bucket GCS, extrai o <title> para o título do post,
 remove tags <title>, <html>, </html>, <!DOCTYPE html> e instâncias do título,
 valida acesso ao bucket antes de gerar imagem, gera capa via OpenAI DALL·E 3 (1792x1024),
-faz upload da imagem com mesmo nome do arquivo HTML, injeta como <img>,
+gera variantes WebP/JPEG em várias larguras (image_utils.py), faz upload com o mesmo nome
+base do arquivo HTML, injeta como <picture>/srcset,
 e publica no Blogger via API v3 sem autenticação interativa.
+
+Antes de publicar, page_weight.py remove o <head>/<style> do post, troca o CSS pela folha
+compartilhada e minifica o HTML (bytes antes/depois no log). O bloco de artigos
+relacionados (RELATED_COUNT, via índice BM25 do search_index.py) entra no fim do post, e a
+URL publicada é gravada no índice para os próximos.
+
+A capa gerada em paralelo pelo cover_agent.py (a partir da ficha) é reaproveitada; sem ela,
+a capa é gerada aqui. A capa não bloqueia a publicação: se não ficar pronta em COVER_DEADLINE_SECONDS, o post
+sai com a capa provisória (COVER_PLACEHOLDER_URL) ou sem capa, e um registro em
+'backfill/<base>.json' fica para o cover_backfill.py aplicar a capa depois (posts().patch).
 """
 
+import html
+import json
 import os
 import sys
 import re
-import requests
+import time
+import threading
+from concurrent.futures import Future, TimeoutError as FuturesTimeout
+from datetime import datetime
 from utils import (
-    load_env, get_env, set_gcp_credentials,
-    sort_by_timestamp, print_log, init_openai_client
+    load_env, get_env, set_gcp_credentials, download_blob_text, upload_blob_text,
+    delete_blob, sort_by_timestamp, print_log, print_upload_stats, init_openai_client,
+    get_http_client
 )
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from google.api_core.exceptions import NotFound
 from google.cloud import storage
+from credentials import get_blogger_service
+from dag import Stage, run_dag
+from rate_limit import set_usage_context
+from image_utils import (
+    cover_settings, build_cover_variants, cover_claim_path, cover_original_path, upload_cover_original,
+    upload_cover_variants,
+    build_picture_html, log_savings
+)
+from page_weight import optimize_for_blogger
+from search_index import load_index, record_published, html_text, related_block
+from profiling import run_profiled
 
+# delimitadores da capa no conteúdo publicado (substituídos pelo backfill)
+COVER_START = "<!--capa-->"
+COVER_END = "<!--/capa-->"
 
-def get_blogger_service(token_file: str):
-    SCOPES = ["https://www.googleapis.com/auth/blogger"]
-    if not os.path.exists(token_file):
-        print_log(f"❌ Token file '{token_file}' não encontrado; abortando.")
-        sys.exit(1)
-    creds = Credentials.from_authorized_user_file(token_file, SCOPES)
-    if creds.expired and creds.refresh_token:
-        creds.refresh(Request())
-        with open(token_file, "w") as tok:
-            tok.write(creds.to_json())
-        print_log("🔄 Token de acesso atualizado.")
-    return build("blogger", "v3", credentials=creds)
-
-
-def main():
-    print_log("=== Iniciando publish_from_htmlblog_blogger ===")
-    load_env()
-    print_log("Ambiente carregado.")
-
-    bucket_name     = get_env("BUCKET_NAME", required=True)
-    auth_json_path  = get_env("AUTH_JSON_PATH", required=True)
-    html_folder     = get_env("HTML_FOLDER", "htmlblog")
-    token_file      = get_env("BLOGGER_TOKEN_FILE", required=True)
-    blog_id         = get_env("BLOG_ID", required=True)
-
-    # Autenticação GCP
-    print_log("Configurando credenciais GCP...")
-    set_gcp_credentials(auth_json_path)
-    # Inicializa Storage Client
-    storage_client = storage.Client()
-    # Valida bucket
-    try:
-        bucket = storage_client.get_bucket(bucket_name)
-    except Exception as e:
-        print_log(f"❌ Não foi possível acessar o bucket '{bucket_name}': {e}")
-        sys.exit(1)
 
-    # Listar e escolher último HTML
+def fetch_latest_html(storage_client, bucket, bucket_name, html_folder):
+    """Retorna (caminho_blob, html_bruto) do HTML mais recente em html_folder."""
     print_log(f"Buscando arquivos em '{html_folder}/'...")
     try:
         blobs = storage_client.list_blobs(bucket_name, prefix=f"{html_folder}/")
@@ -74,16 +68,19 @@ def main():
 
     latest = sort_by_timestamp(html_blobs)[-1]
     print_log(f"→ Encontrado: {latest}")
+    set_usage_context(article=os.path.splitext(os.path.basename(latest))[0])
 
     # Baixar conteúdo HTML
     try:
-        html_blob = bucket.blob(latest)
-        raw_html = html_blob.download_as_text()
+        raw_html = download_blob_text(storage_client, bucket_name, latest)
     except Exception as e:
         print_log(f"❌ Erro ao baixar '{latest}': {e}")
         sys.exit(1)
+    return latest, raw_html
 
-    # Limpeza e extração do título
+
+def clean_html(raw_html):
+    """Extrai o título e remove DOCTYPE, <html>, <title> e repetições do título."""
     html_no_doctype = re.sub(r"<!DOCTYPE[^>]*>\s*", "", raw_html, flags=re.IGNORECASE)
     match = re.search(r"<title>(.*?)</title>", html_no_doctype, re.IGNORECASE | re.DOTALL)
     if not match:
@@ -102,8 +99,11 @@ def main():
         flags=re.IGNORECASE
     )
     cleaned = cleaned.replace(post_title, "").strip()
+    return post_title, cleaned
+
 
-    # Neste ponto, bucket e HTML OK — só gerar imagem
+def request_cover_image(post_title):
+    """Gera a capa via DALL·E e retorna os bytes da imagem original."""
     openai_client = init_openai_client()
     print_log("Gerando capa via OpenAI")
     img_resp = openai_client.images.generate(
@@ -115,37 +115,154 @@ def main():
         n=1
     )
     img_url = img_resp.data[0].url
+    # pool compartilhado: mesmo cliente (keep-alive, HTTP/2) das demais chamadas
+    resp = get_http_client().get(img_url)
+    resp.raise_for_status()
+    return resp.content
 
-    # Upload da capa no GCS
-    base_name = os.path.splitext(os.path.basename(latest))[0]
-    cover_path = f"{html_folder}/{base_name}.jpg"
-    cover_blob = bucket.blob(cover_path)
-    try:
-        image_data = requests.get(img_url).content
-        cover_blob.upload_from_string(image_data, content_type="image/jpeg")
-        cover_blob.make_public()
-        public_img_url = cover_blob.public_url
-        print_log(f"→ Capa publicada em: {public_img_url}")
-    except Exception as e:
-        print_log(f"❌ Erro ao fazer upload da capa: {e}")
-        sys.exit(1)
 
-    # Montar conteúdo final
-    final_content = (
-        f'<p><img src="{public_img_url}" alt="Capa: {post_title}" '
-        'style="max-width:100%;height:auto;"></p>\n'
-        + cleaned
+def publish_cover(bucket, html_folder, base_name, post_title, image_data):
+    """
+    Sobe as variantes responsivas (WebP/JPEG + miniatura para o LinkedIn) no GCS
+    e retorna o bloco <picture> a ser injetado no post.
+    """
+    settings = cover_settings()
+    variants, thumb = build_cover_variants(image_data, settings)
+    log_savings(len(image_data), variants, thumb)
+    public_img_url = upload_cover_variants(
+        bucket, html_folder, base_name, variants, thumb, settings["cache_control"]
     )
+    print_log(f"→ Capa publicada em: {public_img_url}")
+    return build_picture_html(variants, public_img_url, f"Capa: {post_title}")
+
+
+def generate_cover(bucket, html_folder, base_name, post_title):
+    """DALL·E + original + variantes + upload. Levanta exceção em caso de falha: quem chama decide."""
+    image_data = request_cover_image(post_title)
+    # o original sobe primeiro: se o processo sair no meio das variantes, o backfill parte dele
+    upload_cover_original(bucket, html_folder, base_name, image_data)
+    return publish_cover(bucket, html_folder, base_name, post_title, image_data)
+
+
+def wait_for_parallel_cover(bucket, html_folder, base_name):
+    """
+    Original da capa do cover_agent.py, esperando enquanto a marca de geração estiver ativa
+    (no máximo COVER_CLAIM_TTL_SECONDS desde o início). None se não há capa nem geração em
+    andamento — aí quem chama gera a sua.
+    """
+    ttl = float(get_env("COVER_CLAIM_TTL_SECONDS", "300"))
+    poll = float(get_env("COVER_POLL_SECONDS", "2"))
+    claim_path = cover_claim_path(html_folder, base_name)
+    waiting = False
+    while True:
+        original = bucket.get_blob(cover_original_path(html_folder, base_name))
+        if original is not None:
+            return original
+        if bucket.get_blob(claim_path) is None:
+            return None
+        try:
+            started_at = float(json.loads(download_blob_text(bucket.client, bucket.name, claim_path))["started_at"])
+        except NotFound:
+            continue  # o agente terminou entre as duas leituras
+        if time.time() - started_at > ttl:
+            print_log(f"⚠️ Marca de geração de capa antiga ({claim_path}); gerando aqui.")
+            return None
+        if not waiting:
+            print_log("⏳ Capa em geração pelo cover_agent.py; aguardando o original.")
+            waiting = True
+        time.sleep(poll)
+
+
+def reuse_or_generate_cover(bucket, html_folder, base_name, post_title):
+    """
+    Capa já gerada (ou em geração) pelo cover_agent.py é reaproveitada: as variantes são
+    refeitas do PNG original e os uploads idênticos são ignorados. Só chama o DALL·E se não
+    houver original nem geração em andamento — duas gerações misturariam variantes de
+    imagens diferentes no mesmo srcset.
+    """
+    existing = wait_for_parallel_cover(bucket, html_folder, base_name)
+    if existing is None:
+        return generate_cover(bucket, html_folder, base_name, post_title)
+    print_log(f"♻️ Reaproveitando a capa gerada em paralelo: {existing.name}")
+    return publish_cover(bucket, html_folder, base_name, post_title, existing.download_as_bytes())
+
+
+def start_in_background(fn, *args):
+    """
+    Roda `fn` numa thread daemon e devolve um Future com o resultado. Ao contrário de um
+    ThreadPoolExecutor, a saída do processo não espera por ela: o que não ficar pronto a
+    tempo fica para o cover_backfill.py.
+    """
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="cover", daemon=True).start()
+    return future
+
 
-    # Publicar no Blogger
-    print_log("Carregando credenciais do Blogger...")
-    service = get_blogger_service(token_file)
+def wrap_cover(cover_html):
+    """Delimita a capa no conteúdo do post para que o backfill possa substituí-la."""
+    return f"{COVER_START}{cover_html}{COVER_END}"
+
+
+def placeholder_cover_html(post_title):
+    """Capa provisória (COVER_PLACEHOLDER_URL) ou vazio quando não configurada."""
+    url = get_env("COVER_PLACEHOLDER_URL")
+    if not url:
+        return ""
+    return f'<p><img src="{url}" alt="Capa: {html.escape(post_title, quote=True)}" style="max-width:100%;height:auto;"></p>\n'
+
+
+def replace_cover(content, cover_html):
+    """Troca o bloco delimitado da capa; posts sem o bloco recebem a capa no topo."""
+    block = wrap_cover(cover_html)
+    pattern = re.escape(COVER_START) + r".*?" + re.escape(COVER_END)
+    if re.search(pattern, content, flags=re.DOTALL):
+        return re.sub(pattern, lambda _: block, content, count=1, flags=re.DOTALL)
+    return block + content
+
+
+def patch_post_cover(service, blog_id, post_id, cover_html):
+    """Aplica a capa definitiva num post já publicado (posts().patch)."""
+    post = service.posts().get(blogId=blog_id, postId=post_id, view="ADMIN").execute()
+    content = replace_cover(post.get("content", ""), cover_html)
+    service.posts().patch(blogId=blog_id, postId=post_id, body={"content": content}).execute()
+    print_log(f"🖼️ Capa aplicada ao post {post_id}: {post.get('url')}")
+
+
+def save_backfill(client, bucket_name, backfill_folder, base_name, post, blog_id, html_folder, post_title):
+    """Registra o post publicado sem capa para o cover_backfill.py."""
+    record = {
+        "base": base_name,
+        "blog_id": blog_id,
+        "post_id": post.get("id"),
+        "post_url": post.get("url"),
+        "post_title": post_title,
+        "html_folder": html_folder,
+        "created_at": datetime.utcnow().isoformat(),
+        "attempts": 0,
+    }
+    path = f"{backfill_folder}/{base_name}.json"
+    upload_blob_text(client, bucket_name, path, json.dumps(record, ensure_ascii=False, indent=2))
+    print_log(f"📝 Capa pendente registrada em gs://{bucket_name}/{path}")
+    return path
+
+
+def publish_post(service, blog_id, post_title, content):
+    """Insere o post no Blogger e retorna o recurso publicado (id, url...)."""
     print_log("Publicando no Blogger...")
     body = {
         "kind": "blogger#post",
         "blog": {"id": blog_id},
         "title": post_title,
-        "content": final_content
+        "content": content
     }
     try:
         post = service.posts().insert(blogId=blog_id, body=body, isDraft=False).execute()
@@ -153,6 +270,121 @@ def main():
     except Exception as e:
         print_log(f"❌ Erro ao publicar no Blogger: {e}")
         sys.exit(1)
+    return post
+
+
+def main():
+    print_log("=== Iniciando publish_from_htmlblog_blogger ===")
+    load_env()
+    print_log("Ambiente carregado.")
+
+    bucket_name     = get_env("BUCKET_NAME", required=True)
+    auth_json_path  = get_env("AUTH_JSON_PATH", required=True)
+    html_folder     = get_env("HTML_FOLDER", "htmlblog")
+    token_file      = get_env("BLOGGER_TOKEN_FILE", required=True)
+    blog_id         = get_env("BLOG_ID", required=True)
+    backfill_folder = get_env("BACKFILL_FOLDER", "backfill")
+    deadline        = float(get_env("COVER_DEADLINE_SECONDS", "45"))
+    inline_wait     = float(get_env("COVER_INLINE_BACKFILL_SECONDS", "120"))
+    related_count   = int(get_env("RELATED_COUNT", "3"))
+
+    # Autenticação GCP
+    print_log("Configurando credenciais GCP...")
+    set_gcp_credentials(auth_json_path)
+    # Inicializa Storage Client
+    storage_client = storage.Client()
+    # Valida bucket
+    try:
+        bucket = storage_client.get_bucket(bucket_name)
+    except Exception as e:
+        print_log(f"❌ Não foi possível acessar o bucket '{bucket_name}': {e}")
+        sys.exit(1)
+
+    def load_blogger():
+        print_log("Carregando credenciais do Blogger...")
+        return get_blogger_service(token_file)
+
+    # a capa roda fora do DAG: a publicação espera no máximo `deadline` segundos por ela
+    def start_cover(latest, post_title):
+        base_name = os.path.splitext(os.path.basename(latest))[0]
+        return (start_in_background(reuse_or_generate_cover, bucket, html_folder, base_name, post_title),
+                time.monotonic())
+
+    def weigh(latest, cleaned):
+        base_name = os.path.splitext(os.path.basename(latest))[0]
+        return optimize_for_blogger(storage_client, bucket_name, cleaned, base_name)
+
+    def related(latest, post_title, raw_html):
+        if not related_count:
+            return ""
+        base_name = os.path.splitext(os.path.basename(latest))[0]
+        # bloco opcional: índice ilegível não impede a publicação
+        try:
+            index = load_index(storage_client, bucket_name)
+        except Exception as e:
+            print_log(f"⚠️ Índice de busca indisponível ({e}); publicando sem relacionados.")
+            return ""
+        results = index.related(base_name, post_title, html_text(raw_html), k=related_count)
+        print_log(f"🔗 {len(results)} artigos relacionados: {', '.join(r[0] for r in results) or '—'}")
+        return related_block(results)
+
+    def publish(service, latest, post_title, content, related_html, cover_job):
+        future, started = cover_job
+        try:
+            cover_html = future.result(timeout=max(0.0, deadline - (time.monotonic() - started)))
+            deferred = False
+        except FuturesTimeout:
+            print_log(f"⏱️ Capa não ficou pronta em {deadline:g}s; publicando sem ela.")
+            cover_html, deferred = placeholder_cover_html(post_title), True
+        except Exception as e:
+            print_log(f"⚠️ Falha ao gerar a capa ({e}); publicando sem ela.")
+            cover_html, deferred = placeholder_cover_html(post_title), True
+
+        post = publish_post(service, blog_id, post_title, wrap_cover(cover_html) + content + related_html)
+        if deferred:
+            base_name = os.path.splitext(os.path.basename(latest))[0]
+            save_backfill(storage_client, bucket_name, backfill_folder, base_name, post,
+                          blog_id, html_folder, post_title)
+        return post.get("url"), post, deferred
+
+    # A capa só depende do título; credenciais do Blogger carregam em paralelo
+    stages = [
+        Stage("html",    lambda: fetch_latest_html(storage_client, bucket, bucket_name, html_folder),
+              outputs=("latest", "raw_html")),
+        Stage("clean",   clean_html, inputs=("raw_html",), outputs=("post_title", "cleaned")),
+        Stage("weight",  weigh, inputs=("latest", "cleaned"), outputs=("content",)),
+        Stage("related", related, inputs=("latest", "post_title", "raw_html"),
+              outputs=("related_html",)),
+        Stage("cover",   start_cover, inputs=("latest", "post_title"), outputs=("cover_job",)),
+        Stage("blogger", load_blogger, outputs=("service",)),
+        Stage("publish", publish,
+              inputs=("service", "latest", "post_title", "content", "related_html", "cover_job"),
+              outputs=("post_url", "post", "deferred")),
+    ]
+    ctx, _ = run_dag(stages, title="post_blog")
+
+    # o post publicado passa a ser candidato a relacionado dos próximos (índice relido agora)
+    base_name = os.path.splitext(os.path.basename(ctx["latest"]))[0]
+    if ctx["post_url"]:
+        # o post já está no ar: falha no índice não pode derrubar capa e compartilhamentos
+        try:
+            record_published(storage_client, bucket_name, base_name, ctx["post_title"],
+                             html_text(ctx["raw_html"]), ctx["post_url"])
+        except Exception as e:
+            print_log(f"⚠️ {base_name}: URL não gravada no índice de busca ({e}).")
+
+    # o post já está no ar; se a capa chegar logo, aplica aqui mesmo e dispensa o backfill
+    if ctx["deferred"]:
+        future, _ = ctx["cover_job"]
+        try:
+            cover_html = future.result(timeout=inline_wait)
+            patch_post_cover(ctx["service"], blog_id, ctx["post"]["id"], cover_html)
+            delete_blob(storage_client, bucket_name, f"{backfill_folder}/{base_name}.json")
+        except FuturesTimeout:
+            print_log(f"⏳ Capa ainda em geração após {inline_wait:g}s; fica para o cover_backfill.py.")
+        except Exception as e:
+            print_log(f"⚠️ Capa não aplicada ({e}); fica para o cover_backfill.py.")
+    print_upload_stats()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    run_profiled(main, "post_blog")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+profiling.py
+Modo de profiling para qualquer agente (ou o pipeline completo via main.py).
+
+Ativado com PROFILE=1 ou com a flag `--profile` na linha de comando. Executa o agente
+sob cProfile + tracemalloc e grava em PROFILE_DIR (padrão: logs/):
+  • <agente>_<timestamp>.pstats     — abra com `python -m pstats` ou snakeviz
+  • <agente>_<timestamp>_prof.txt   — top funções por tempo cumulativo, top alocações
+                                      e picos de memória (tracemalloc e RSS)
+Desligado, `run_profiled` apenas chama a função: custo zero.
+"""
+
+import os
+import sys
+
+
+def profiling_enabled():
+    if "--profile" in sys.argv:
+        sys.argv.remove("--profile")
+        os.environ["PROFILE"] = "1"     # propaga para subprocessos (main.py)
+    return os.getenv("PROFILE") == "1"
+
+
+def run_profiled(func, name):
+    if not profiling_enabled():
+        return func()
+    return _profile(func, name)
+
+
+def _peak_rss_mb():
+    import resource
+    # ru_maxrss em KB no Linux, bytes no macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return own, children
+
+
+def _profile(func, name):
+    import cProfile
+    import io
+    import pstats
+    import time
+    import tracemalloc
+    from datetime import datetime
+    from utils import print_log
+
+    folder = os.getenv("PROFILE_DIR", "logs")
+    os.makedirs(folder, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    prefix = os.path.join(folder, f"{name}_{stamp}")
+    top_n = int(os.getenv("PROFILE_TOP", "30"))
+
+    profiler = cProfile.Profile()
+    tracemalloc.start(int(os.getenv("PROFILE_TRACEBACK", "1")))
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        return func()
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - start
+        snapshot = tracemalloc.take_snapshot()
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        profiler.dump_stats(f"{prefix}.pstats")
+        rss_own, rss_children = _peak_rss_mb()
+
+        out = io.StringIO()
+        out.write(f"# {name} — {elapsed:.2f}s de parede\n")
+        out.write(f"pico tracemalloc: {traced_peak / 1024 / 1024:.1f} MB\n")
+        out.write(f"pico RSS: {rss_own:.1f} MB (processo), {rss_children:.1f} MB (maior subprocesso)\n\n")
+        out.write(f"## Top {top_n} funções por tempo cumulativo\n")
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(top_n)
+        out.write(f"\n## Top {top_n} alocações (por linha)\n")
+        for stat in snapshot.statistics("lineno")[:top_n]:
+            out.write(f"{stat}\n")
+        with open(f"{prefix}_prof.txt", "w") as f:
+            f.write(out.getvalue())
+
+        print_log(
+            f"🔬 Profile de '{name}': {elapsed:.2f}s, pico tracemalloc {traced_peak / 1024 / 1024:.1f} MB, "
+            f"pico RSS {rss_own:.1f} MB → {prefix}.pstats / {prefix}_prof.txt"
+        )
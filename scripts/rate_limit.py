@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+rate_limit.py
+Cliente OpenAI com controle de vazão e contabilidade de uso.
+
+• Antes de cada chamada estima os tokens do prompt e consome de dois token buckets
+  por modelo (RPM e TPM), compartilhados entre processos via arquivo com lock — vários
+  agentes rodando ao mesmo tempo dividem o mesmo orçamento e esperam em vez de tomar 429.
+• Após a resposta, registra o `usage` real: devolve ao bucket o que foi superestimado e
+  ajusta o fator de correção da estimativa.
+• Ao final do processo imprime tokens e custo por estágio e por artigo, e o quanto de
+  cada prompt registrado (prompts.py) veio do cache do provedor (`cached_tokens`)
+  com a latência média com/sem cache (e anexa tudo em OPENAI_USAGE_FILE, se definido).
+
+• Com MODEL_ROUTES configurado, o modelo/backend de cada chamada vem do roteador por
+  estágio (router.py), com fallback em erro/timeout e rebaixamento de rotas lentas.
+
+Limites: OPENAI_RATE_LIMITS='{"gpt-4o": {"rpm": 500, "tpm": 30000}}'
+(modelos ausentes usam OPENAI_DEFAULT_RPM / OPENAI_DEFAULT_TPM).
+"""
+
+import atexit
+import fcntl
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from utils import get_env, print_log
+from prompts import identify
+import router
+
+# USD por 1M tokens (entrada, saída); sobrescreva com OPENAI_PRICES no mesmo formato
+DEFAULT_PRICES = {
+    "gpt-4o":       [2.50, 10.00],
+    "gpt-4o-mini":  [0.15, 0.60],
+    "gpt-4.1":      [2.00, 8.00],
+    "gpt-4.1-mini": [0.40, 1.60],
+}
+# USD por imagem
+IMAGE_PRICES = {"dall-e-3": 0.08}
+
+CHARS_PER_TOKEN = 4.0
+
+USAGE_LOG = []
+_context = {"stage": None, "article": None}
+_correction = {"ratio": 1.0}
+_lock = threading.Lock()
+_report_registered = False
+
+
+def set_usage_context(stage=None, article=None):
+    """Define estágio/artigo atribuídos às próximas chamadas."""
+    if stage is not None:
+        _context["stage"] = stage
+    if article is not None:
+        _context["article"] = article
+
+
+def _limits(model):
+    limits = json.loads(get_env("OPENAI_RATE_LIMITS", "{}") or "{}")
+    cfg = limits.get(model, {})
+    headroom = float(get_env("OPENAI_RATE_HEADROOM", "0.9"))
+    rpm = float(cfg.get("rpm", get_env("OPENAI_DEFAULT_RPM", "500")))
+    tpm = float(cfg.get("tpm", get_env("OPENAI_DEFAULT_TPM", "30000")))
+    return rpm * headroom, tpm * headroom
+
+
+class TokenBucket:
+    """
+    Token bucket persistido em arquivo: o estado (saldo, último refill) é lido e gravado
+    sob flock, então processos concorrentes na mesma máquina compartilham o limite.
+    """
+
+    def __init__(self, name, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        folder = get_env("OPENAI_BUCKET_DIR", os.path.join(tempfile.gettempdir(), "hub-openai-buckets"))
+        os.makedirs(folder, exist_ok=True)
+        self.path = os.path.join(folder, f"{name}.json")
+
+    def _update(self, fn):
+        with open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                state = json.loads(raw) if raw else {"tokens": self.capacity, "ts": time.time()}
+                now = time.time()
+                state["tokens"] = min(self.capacity, state["tokens"] + (now - state["ts"]) * self.rate)
+                state["ts"] = now
+                result = fn(state)
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                return result
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def acquire(self, amount):
+        """Bloqueia até haver saldo; retorna o tempo esperado em segundos."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            def take(state):
+                if state["tokens"] >= amount:
+                    state["tokens"] -= amount
+                    return 0.0
+                return (amount - state["tokens"]) / self.rate
+            wait = self._update(take)
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def credit(self, amount):
+        """Devolve (ou, se negativo, cobra) a diferença entre estimado e real."""
+        def adjust(state):
+            state["tokens"] = min(self.capacity, state["tokens"] + amount)
+        self._update(adjust)
+
+
+_buckets = {}
+
+def _buckets_for(model):
+    with _lock:
+        if model not in _buckets:
+            rpm, tpm = _limits(model)
+            safe = model.replace("/", "_")
+            _buckets[model] = (TokenBucket(f"{safe}.rpm", rpm), TokenBucket(f"{safe}.tpm", tpm))
+        return _buckets[model]
+
+
+def estimate_prompt_tokens(messages):
+    chars = sum(len(m.get("content") or "") for m in messages)
+    # ~4 tokens de overhead por mensagem
+    return int(chars / CHARS_PER_TOKEN * _correction["ratio"]) + 4 * len(messages)
+
+
+def _cost(model, prompt_tokens, completion_tokens, cached_tokens=0):
+    prices = dict(DEFAULT_PRICES)
+    prices.update(json.loads(get_env("OPENAI_PRICES", "{}") or "{}"))
+    price_in, price_out = prices.get(model, (0.0, 0.0))
+    # tokens servidos do cache de prompt são cobrados com desconto
+    discount = float(get_env("OPENAI_CACHED_DISCOUNT", "0.5"))
+    billed_in = prompt_tokens - cached_tokens * discount
+    return (billed_in * price_in + completion_tokens * price_out) / 1_000_000
+
+
+def record_usage(model, prompt_tokens, completion_tokens, latency, waited=0.0, cost=None,
+                 cached_tokens=0, cost_factor=1.0, **extra):
+    entry = {
+        "stage": _context["stage"],
+        "article": _context["article"],
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cached_tokens": cached_tokens,
+        "cost": cost if cost is not None else _cost(model, prompt_tokens, completion_tokens, cached_tokens) * cost_factor,
+        "latency": round(latency, 3),
+        "waited": round(waited, 3),
+    }
+    entry.update(extra)
+    with _lock:
+        USAGE_LOG.append(entry)
+    return entry
+
+
+def _call_with_retry(fn, **kwargs):
+    """
+    Única camada de retry: os clientes embrulhados têm max_retries=0 no SDK, então 429,
+    5xx e falhas de conexão são repetidos só aqui (com o retry-after do 429).
+    """
+    import openai
+    retries = int(get_env("OPENAI_MAX_RETRIES", "5"))
+    for attempt in range(retries + 1):
+        try:
+            return fn(**kwargs)
+        except (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError) as e:
+            if attempt == retries:
+                raise
+            retry_after = None
+            if getattr(e, "response", None) is not None:
+                retry_after = e.response.headers.get("retry-after")
+            delay = float(retry_after) if retry_after else min(60.0, 2 ** attempt)
+            reason = "429" if isinstance(e, openai.RateLimitError) else type(e).__name__
+            print_log(f"⏳ {reason} da OpenAI; nova tentativa em {delay:.1f}s ({attempt + 1}/{retries})")
+            time.sleep(delay)
+
+
+class _Completions:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, **kwargs):
+        name, _, _ = identify(kwargs.get("messages", []))
+        routes = router.plan(name)
+        if not routes:
+            return self._create_on(self._client, kwargs)
+
+        # roteado: cada rota tem timeout próprio e não repete — o fallback é a próxima rota;
+        # a última (ou rota única/"*") não tem para onde cair e volta a repetir (_call_with_retry)
+        for i, route in enumerate(routes):
+            last = i == len(routes) - 1
+            client = router.client_for(route["backend"], self._client)
+            if route["timeout"]:
+                client = client.with_options(timeout=route["timeout"])
+            # só a chamada HTTP entra na latência observada (a espera no limite local fica fora)
+            timing = {}
+            try:
+                resp = self._create_on(client, dict(kwargs, model=route["model"]),
+                                       retry=last, backend=route["backend"], timing=timing)
+            except Exception as e:
+                if "latency" in timing:
+                    router.observe(route, timing["latency"], ok=False)
+                if last:
+                    raise
+                print_log(f"↪️ {name or '?'}: {route['backend']}/{route['model']} falhou "
+                          f"({type(e).__name__}); tentando a próxima rota")
+                continue
+            router.observe(route, timing["latency"], ok=True)
+            return resp
+
+    def _create_on(self, client, kwargs, retry=True, backend=None, timing=None):
+        model = kwargs["model"]
+        messages = kwargs.get("messages", [])
+        estimated_in = estimate_prompt_tokens(messages)
+        expected_out = int(kwargs.get("max_tokens") or get_env("OPENAI_EXPECTED_OUTPUT_TOKENS", "1000"))
+        rpm_bucket, tpm_bucket = _buckets_for(model)
+        waited = rpm_bucket.acquire(1) + tpm_bucket.acquire(estimated_in + expected_out)
+        if waited:
+            print_log(f"⏳ Aguardou {waited:.1f}s pelo limite de {model}")
+
+        start = time.perf_counter()
+        try:
+            if retry:
+                resp = _call_with_retry(client.chat.completions.create, **kwargs)
+            else:
+                resp = client.chat.completions.create(**kwargs)
+        except Exception:
+            # nada foi consumido do lado do provedor: devolve a reserva às próximas chamadas
+            tpm_bucket.credit(estimated_in + expected_out)
+            raise
+        finally:
+            latency = time.perf_counter() - start
+            if timing is not None:
+                timing["latency"] = latency
+
+        usage = getattr(resp, "usage", None)
+        if usage is not None:
+            actual = usage.prompt_tokens + usage.completion_tokens
+            tpm_bucket.credit(estimated_in + expected_out - actual)
+            # EWMA do erro de estimativa do prompt
+            raw_estimate = max(1, estimated_in / _correction["ratio"])
+            _correction["ratio"] = 0.7 * _correction["ratio"] + 0.3 * (usage.prompt_tokens / raw_estimate)
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached = getattr(details, "cached_tokens", 0) or 0
+            name, version, phash = identify(messages)
+            extra = {"backend": backend} if backend else {}
+            record_usage(model, usage.prompt_tokens, usage.completion_tokens, latency, waited,
+                         cached_tokens=cached, prompt=name, prompt_version=version, prompt_hash=phash,
+                         **extra)
+        return resp
+
+
+class _Chat:
+    def __init__(self, client):
+        self.completions = _Completions(client)
+
+
+class _Images:
+    def __init__(self, client):
+        self._client = client
+
+    def generate(self, **kwargs):
+        model = kwargs.get("model", "dall-e-3")
+        rpm_bucket, _ = _buckets_for(model)
+        waited = rpm_bucket.acquire(1)
+        start = time.perf_counter()
+        resp = _call_with_retry(self._client.images.generate, **kwargs)
+        n = kwargs.get("n", 1)
+        record_usage(model, 0, 0, time.perf_counter() - start, waited,
+                     cost=IMAGE_PRICES.get(model, 0.0) * n, images=n)
+        return resp
+
+
+class RateLimitedOpenAI:
+    """Expõe `chat.completions.create` e `images.generate` com pacing; o resto é repassado."""
+
+    def __init__(self, client, stage=None):
+        self._client = client
+        # sem retries do SDK nas chamadas controladas: _call_with_retry já repete (senão cada
+        # 429 seria repetido pelas duas camadas, furando o pacing)
+        calls = client.with_options(max_retries=0)
+        self.chat = _Chat(calls)
+        self.images = _Images(calls)
+        set_usage_context(stage=stage or os.path.splitext(os.path.basename(sys.argv[0]))[0])
+        _register_report()
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def _register_report():
+    global _report_registered
+    if not _report_registered:
+        atexit.register(print_usage_report)
+        _report_registered = True
+
+
+def print_usage_report():
+    if not USAGE_LOG:
+        return
+    for key, label in (("stage", "estágio"), ("article", "artigo")):
+        totals = defaultdict(lambda: [0, 0, 0.0, 0])
+        for e in USAGE_LOG:
+            t = totals[e[key] or "-"]
+            t[0] += e["prompt_tokens"]
+            t[1] += e["completion_tokens"]
+            t[2] += e["cost"]
+            t[3] += 1
+        for name, (p, c, cost, calls) in totals.items():
+            print_log(f"💰 {label} {name}: {calls} chamadas, {p} tokens entrada, {c} saída, US$ {cost:.4f}")
+
+    print_cache_report()
+
+    usage_file = get_env("OPENAI_USAGE_FILE")
+    if usage_file:
+        with open(usage_file, "a") as f:
+            for e in USAGE_LOG:
+                f.write(json.dumps(e, ensure_ascii=False) + "\n")
+
+
+def print_cache_report():
+    """Fração do prompt servida do cache e latência média com/sem cache, por prompt registrado."""
+    by_prompt = defaultdict(list)
+    for e in USAGE_LOG:
+        if e.get("prompt_hash"):
+            by_prompt[(e.get("prompt"), e.get("prompt_version"), e["prompt_hash"])].append(e)
+    for (name, version, phash), entries in by_prompt.items():
+        prompt_tokens = sum(e["prompt_tokens"] for e in entries)
+        cached = sum(e["cached_tokens"] for e in entries)
+        hit = [e["latency"] for e in entries if e["cached_tokens"]]
+        miss = [e["latency"] for e in entries if not e["cached_tokens"]]
+        avg = lambda xs: f"{sum(xs) / len(xs):.2f}s" if xs else "-"
+        pct = 100 * cached / prompt_tokens if prompt_tokens else 0
+        print_log(
+            f"🧊 prompt {name or '?'} v{version or '?'} ({phash}): {len(entries)} chamadas, "
+            f"{cached}/{prompt_tokens} tokens do cache ({pct:.0f}%), "
+            f"latência média com cache {avg(hit)} × sem cache {avg(miss)}"
+        )
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+ready_buffer.py
+Buffer de artigos prontos para publicar, separando produção (lenta, fora do pico) da
+publicação (segundos, no horário agendado).
+
+• produce: mantém READY_BUFFER_SIZE artigos completos em 'ready/<base>.json' — HTML limpo e
+           otimizado (page_weight.py), capa já enviada (<picture>), texto do LinkedIn e
+           miniatura — validados. Roda head → draft → design quantas vezes faltar e prepara
+           cada HTML novo (capa + texto).
+• publish: retira o artigo pronto mais antigo, publica no Blogger e no LinkedIn (feed
+           pessoal e, com PUBLISH_LINKEDIN_PAGE=1, a página) e o move para 'ready/published/'.
+           O id/URL do post é gravado no item logo após a inserção: uma nova tentativa não
+           publica de novo no Blogger. Compartilhamentos que falham viram registros em
+           'backfill/' para o cover_backfill.py repetir.
+• status : só imprime as métricas.
+
+Métricas (profundidade e idade do mais antigo/mais novo) são impressas a cada execução,
+gravadas em 'ready/_status.json' e anexadas em READY_METRICS_FILE (JSONL), se definido.
+
+O texto do LinkedIn é gerado antes de existir a URL do post: o link entra como
+URL_PLACEHOLDER e é substituído na publicação. Use este modo OU o pipeline ao vivo
+(main.py / post_blog.py) — os dois publicariam o mesmo HTML.
+
+Uso: python3 ready_buffer.py [produce|publish|status]
+"""
+
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+from utils import (
+    load_env, get_env, set_gcp_credentials, init_storage_client, list_blob_names,
+    download_blob_text, upload_blob_text, delete_blob, get_basename, sort_by_timestamp,
+    print_log, print_upload_stats
+)
+from credentials import get_blogger_service, get_linkedin_token
+from dag import Stage, run_dag
+from linkedin_utils import generate_post_text, share_with_image, save_pending_share
+from post_blog import clean_html, reuse_or_generate_cover, publish_post, wrap_cover
+from page_weight import optimize_for_blogger
+from search_index import load_index, record_published, html_text, related_block
+from main import run_agent
+from rate_limit import set_usage_context
+from profiling import run_profiled
+
+URL_PLACEHOLDER = "{{URL_DO_ARTIGO}}"
+LINKEDIN_MAX_CHARS = 3000
+GENERATORS = ("head_agent.py", "draft_agent.py", "design_agent.py")
+
+
+def _now():
+    return datetime.utcnow()
+
+
+def list_ready(client, bucket, ready_folder):
+    """Bases prontas, da mais antiga para a mais nova (ignora subpastas e '_*.json')."""
+    names = [
+        n for n in list_blob_names(client, bucket, ready_folder)
+        if n.endswith(".json") and "/" not in n[len(ready_folder) + 1:]
+        and not get_basename(n).startswith("_")
+    ]
+    return [os.path.splitext(get_basename(n))[0] for n in sort_by_timestamp(names)]
+
+
+def load_state(client, bucket, ready_folder):
+    try:
+        return json.loads(download_blob_text(client, bucket, f"{ready_folder}/_state.json"))
+    except Exception:
+        return {}
+
+
+def save_state(client, bucket, ready_folder, state):
+    upload_blob_text(client, bucket, f"{ready_folder}/_state.json", json.dumps(state, indent=2))
+
+
+def buffer_metrics(client, bucket, ready_folder, target):
+    ages = []
+    for base in list_ready(client, bucket, ready_folder):
+        item = json.loads(download_blob_text(client, bucket, f"{ready_folder}/{base}.json"))
+        ages.append((_now() - datetime.fromisoformat(item["prepared_at"])).total_seconds())
+    return {
+        "at": _now().isoformat(),
+        "depth": len(ages),
+        "target": target,
+        "oldest_age_s": round(max(ages), 1) if ages else None,
+        "newest_age_s": round(min(ages), 1) if ages else None,
+    }
+
+
+def report_metrics(client, bucket, ready_folder, target, event):
+    m = dict(buffer_metrics(client, bucket, ready_folder, target), event=event)
+    hours = lambda s: "—" if s is None else f"{s / 3600:.1f}h"
+    print_log(
+        f"📚 Buffer: {m['depth']}/{m['target']} prontos; mais antigo {hours(m['oldest_age_s'])}, "
+        f"mais novo {hours(m['newest_age_s'])}"
+    )
+    upload_blob_text(client, bucket, f"{ready_folder}/_status.json", json.dumps(m, indent=2))
+    metrics_file = get_env("READY_METRICS_FILE")
+    if metrics_file:
+        with open(metrics_file, "a") as f:
+            f.write(json.dumps(m) + "\n")
+    return m
+
+
+def validate_ready(item, thumb_exists):
+    """Lista de problemas que impedem a publicação instantânea (vazia = pronto)."""
+    problems = []
+    if not item.get("title"):
+        problems.append("sem título")
+    if "<h2" not in item.get("content", "").lower():
+        problems.append("HTML sem seções <h2>")
+    if "<picture>" not in item.get("cover_html", ""):
+        problems.append("capa ausente")
+    if not thumb_exists:
+        problems.append("miniatura do LinkedIn ausente")
+    text = item.get("linkedin_text", "")
+    if URL_PLACEHOLDER not in text:
+        problems.append("texto do LinkedIn sem o link")
+    if len(text) > LINKEDIN_MAX_CHARS:
+        problems.append(f"texto do LinkedIn com {len(text)} caracteres (> {LINKEDIN_MAX_CHARS})")
+    return problems
+
+
+def prepare(client, bucket, gcs_bucket, cfg, base):
+    """HTML → (título, conteúdo) + capa + texto do LinkedIn; grava em ready/ se válido."""
+    set_usage_context(article=base)
+    raw_html = download_blob_text(client, bucket, f"{cfg['html']}/{base}.html")
+    title, content = clean_html(raw_html)
+    content = optimize_for_blogger(client, bucket, content, base)
+    cover_html = reuse_or_generate_cover(gcs_bucket, cfg["html"], base, title)
+    text = generate_post_text(cfg["chat_model"], title, URL_PLACEHOLDER)
+    if URL_PLACEHOLDER not in text:
+        text = f"{text}\n\n{URL_PLACEHOLDER}"
+    thumb = f"{cfg['html']}/{base}_thumb.jpg"
+    item = {
+        "base": base,
+        "title": title,
+        "content": content,
+        "cover_html": cover_html,
+        "thumb": thumb,
+        "linkedin_text": text,
+        "prepared_at": _now().isoformat(),
+    }
+    problems = validate_ready(item, gcs_bucket.get_blob(thumb) is not None)
+    folder = cfg["ready"] if not problems else f"{cfg['ready']}/rejected"
+    item["problems"] = problems
+    upload_blob_text(client, bucket, f"{folder}/{base}.json", json.dumps(item, ensure_ascii=False, indent=2))
+    if problems:
+        print_log(f"❌ {base} rejeitado: {', '.join(problems)}")
+        return False
+    print_log(f"✅ {base} pronto: “{title}”")
+    return True
+
+
+def html_bases(client, bucket, html_folder):
+    return sorted(
+        os.path.splitext(get_basename(n))[0]
+        for n in list_blob_names(client, bucket, html_folder) if n.endswith(".html")
+    )
+
+
+def produce(client, bucket, gcs_bucket, cfg):
+    state = load_state(client, bucket, cfg["ready"])
+    if "watermark" not in state:
+        # primeira execução: o que já existe foi (ou será) publicado pelo fluxo ao vivo
+        existing = html_bases(client, bucket, cfg["html"])
+        state["watermark"] = existing[-1] if existing else ""
+        save_state(client, bucket, cfg["ready"], state)
+        print_log(f"→ Marca d'água inicial: '{state['watermark']}' (HTMLs anteriores ficam fora do buffer).")
+
+    depth = len(list_ready(client, bucket, cfg["ready"]))
+    candidates = [b for b in html_bases(client, bucket, cfg["html"]) if b > state["watermark"]]
+    missing = cfg["size"] - depth - len(candidates)
+    print_log(f"→ {depth} prontos, {len(candidates)} HTMLs a preparar, {max(0, missing)} a gerar.")
+
+    for _ in range(max(0, missing)):
+        for script in GENERATORS:
+            run_agent(script)
+    candidates = [b for b in html_bases(client, bucket, cfg["html"]) if b > state["watermark"]]
+
+    for base in candidates:
+        try:
+            prepare(client, bucket, gcs_bucket, cfg, base)
+        except (Exception, SystemExit) as e:
+            print_log(f"⚠️ {base}: falha ao preparar ({e}); nova tentativa na próxima execução.")
+            break
+        state["watermark"] = base
+        save_state(client, bucket, cfg["ready"], state)
+
+
+def publish(client, bucket, gcs_bucket, cfg):
+    ready = list_ready(client, bucket, cfg["ready"])
+    if not ready:
+        print_log("❌ Buffer vazio: nada pronto para publicar (rode 'produce').")
+        sys.exit(1)
+    base = ready[0]
+    path = f"{cfg['ready']}/{base}.json"
+    item = json.loads(download_blob_text(client, bucket, path))
+    set_usage_context(article=base)
+    print_log(f"📤 Publicando {base}: “{item['title']}”")
+
+    authors = [a for a in (get_env("LINKEDIN_PERSON_URN"),) if a]
+    if get_env("PUBLISH_LINKEDIN_PAGE", "0") == "1" and get_env("LINKEDIN_ORGANIZATION_URN"):
+        authors.append(get_env("LINKEDIN_ORGANIZATION_URN"))
+
+    # relacionados calculados na publicação: incluem o que foi publicado depois da produção
+    related_count = int(get_env("RELATED_COUNT", "3"))
+    related = []
+    if related_count:
+        try:
+            related = load_index(client, bucket).related(base, item["title"], html_text(item["content"]),
+                                                         k=related_count)
+        except Exception as e:
+            print_log(f"⚠️ Índice de busca indisponível ({e}); publicando sem relacionados.")
+
+    lock = threading.Lock()
+
+    def save_item():
+        with lock:
+            upload_blob_text(client, bucket, path, json.dumps(item, ensure_ascii=False, indent=2))
+
+    def blogger():
+        # já inserido numa tentativa anterior: não publica de novo (evita post duplicado)
+        if item.get("post_id"):
+            print_log(f"↷ {base} já está no Blogger: {item['post_url']}")
+            return {"id": item["post_id"], "url": item["post_url"]}
+        service = get_blogger_service(cfg["blogger_token"])
+        content = wrap_cover(item["cover_html"]) + item["content"] + related_block(related)
+        post = publish_post(service, cfg["blog_id"], item["title"], content)
+        item.update(post_id=post.get("id"), post_url=post.get("url"))
+        save_item()
+        return post
+
+    def share(author):
+        def run(post, image_bytes):
+            if author in item.setdefault("linkedin_done", []):
+                return
+            text = item["linkedin_text"].replace(URL_PLACEHOLDER, post.get("url", ""))
+            try:
+                share_with_image(get_linkedin_token(), author, text, item["title"], image_bytes)
+            except (Exception, SystemExit) as e:
+                # o post já está no ar: o compartilhamento fica para o cover_backfill.py
+                print_log(f"⚠️ {base}: falha ao compartilhar como {author} ({e}); fica para nova tentativa.")
+                save_pending_share(bucket, get_env("BACKFILL_FOLDER", "backfill"), base, author,
+                                   text, item["title"], post.get("url", ""))
+                return
+            with lock:
+                item["linkedin_done"].append(author)
+            save_item()
+        return run
+
+    # Blogger e download da miniatura em paralelo; cada autor do LinkedIn em paralelo depois
+    stages = [
+        Stage("blogger", blogger, outputs=("post",)),
+        Stage("thumb", lambda: gcs_bucket.blob(item["thumb"]).download_as_bytes(), outputs=("image_bytes",)),
+    ] + [
+        Stage(f"linkedin_{i}", share(author), inputs=("post", "image_bytes"))
+        for i, author in enumerate(authors)
+    ]
+    run_dag(stages, title="ready_publish")
+
+    item.update(published_at=_now().isoformat(), linkedin_authors=authors)
+    upload_blob_text(client, bucket, f"{cfg['ready']}/published/{base}.json",
+                     json.dumps(item, ensure_ascii=False, indent=2))
+    delete_blob(client, bucket, path)
+    if item["post_url"]:
+        try:
+            record_published(client, bucket, base, item["title"], html_text(item["content"]), item["post_url"])
+        except Exception as e:
+            print_log(f"⚠️ {base}: URL não gravada no índice de busca ({e}).")
+    wait = (_now() - datetime.fromisoformat(item["prepared_at"])).total_seconds()
+    print_log(f"✅ {base} publicado após {wait / 3600:.1f}h no buffer: {item['post_url']}")
+
+
+def main():
+    print_log("=== Iniciando ready_buffer ===")
+    load_env()
+    print_log("Ambiente carregado.")
+
+    mode = sys.argv[1] if len(sys.argv) > 1 else "status"
+    if mode not in ("produce", "publish", "status"):
+        print_log(f"❌ Modo inválido '{mode}'. Uso: ready_buffer.py [produce|publish|status]")
+        sys.exit(1)
+
+    cfg = {
+        "ready":         get_env("READY_FOLDER", "ready"),
+        "html":          get_env("HTML_FOLDER", "htmlblog"),
+        "size":          int(get_env("READY_BUFFER_SIZE", "3")),
+        "chat_model":    get_env("OPENAI_CHAT_MODEL", "gpt-4o"),
+        "blogger_token": get_env("BLOGGER_TOKEN_FILE"),
+        "blog_id":       get_env("BLOG_ID"),
+    }
+    set_gcp_credentials(get_env("AUTH_JSON_PATH"))
+    client, bucket = init_storage_client()
+    try:
+        gcs_bucket = client.get_bucket(bucket)
+    except Exception as e:
+        print_log(f"❌ Não foi possível acessar o bucket '{bucket}': {e}")
+        sys.exit(1)
+
+    if mode == "produce":
+        produce(client, bucket, gcs_bucket, cfg)
+    elif mode == "publish":
+        if not (cfg["blogger_token"] and cfg["blog_id"]):
+            print_log("❌ Defina BLOGGER_TOKEN_FILE e BLOG_ID para publicar.")
+            sys.exit(1)
+        publish(client, bucket, gcs_bucket, cfg)
+    report_metrics(client, bucket, cfg["ready"], cfg["size"], mode)
+    print_upload_stats()
+
+
+if __name__ == "__main__":
+    run_profiled(main, "ready_buffer")
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+router.py
+Roteamento de modelo por estágio para as chamadas de chat (usado por rate_limit.py).
+
+O estágio é o nome do prompt registrado em prompts.py (head, draft, design, design_section,
+linkedin, ...), identificado pelo hash do prefixo — os agentes não mudam. Cada estágio tem
+uma lista ordenada de (backend, modelo), um SLO de latência e um timeout; em erro ou
+timeout a chamada cai para a próxima rota. Backends são endpoints compatíveis com a API
+da OpenAI (ex.: vLLM, Ollama, llama.cpp server) ou "openai" (o cliente padrão).
+
+A latência observada (EWMA) e as falhas seguidas de cada backend/modelo ficam em arquivo
+com lock, compartilhado entre processos. Acima do SLO (ou após ROUTER_MAX_FAILURES falhas
+seguidas) a rota é rebaixada para o fim da fila por ROUTER_DEMOTION_SECONDS; vencido o
+prazo ela volta a ser tentada na ordem original.
+
+Configuração em MODEL_ROUTES (JSON) ou MODEL_ROUTES_FILE (caminho), por exemplo:
+{
+  "backends": {"local": {"base_url": "http://localhost:8000/v1", "api_key": "local"}},
+  "stages": {
+    "linkedin": {"slo_seconds": 15, "routes": [{"backend": "local", "model": "qwen2.5-7b-instruct"},
+                                               {"backend": "openai", "model": "gpt-4o-mini"}]},
+    "*":        {"slo_seconds": 90, "routes": [{"backend": "openai", "model": "gpt-4o"}]}
+  }
+}
+Sem configuração, cada agente usa o modelo de OPENAI_MODEL / OPENAI_CHAT_MODEL como antes.
+"""
+
+import atexit
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from utils import get_env, print_log, get_http_client
+
+DEFAULT_BACKEND = "openai"
+
+_config = None
+_clients = {}
+_lock = threading.Lock()
+ROUTER_LOG = defaultdict(lambda: {"calls": 0, "failures": 0, "latencies": []})
+_report_registered = False
+
+
+def load_routes():
+    global _config
+    if _config is None:
+        path = get_env("MODEL_ROUTES_FILE")
+        if path:
+            with open(path) as f:
+                _config = json.load(f)
+        else:
+            _config = json.loads(get_env("MODEL_ROUTES", "{}") or "{}")
+    return _config
+
+
+def _stats_path():
+    folder = get_env("OPENAI_BUCKET_DIR", os.path.join(tempfile.gettempdir(), "hub-openai-buckets"))
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, "router_stats.json")
+
+
+def _update_stats(fn):
+    """Lê/grava o estado das rotas sob flock (mesmo esquema dos token buckets)."""
+    with open(_stats_path(), "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            raw = f.read()
+            stats = json.loads(raw) if raw else {}
+            result = fn(stats)
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps(stats))
+            return result
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _key(route):
+    return f"{route['backend']}|{route['model']}"
+
+
+def plan(stage):
+    """Rotas do estágio na ordem de tentativa: saudáveis na ordem configurada, rebaixadas no fim."""
+    stages = load_routes().get("stages", {})
+    spec = stages.get(stage) if stage else None
+    spec = spec or stages.get("*")
+    if not spec:
+        return []
+    slo = spec.get("slo_seconds")
+    timeout = spec.get("timeout_seconds", slo * 2 if slo else None)
+    routes = [dict(r, slo=slo, timeout=timeout, stage=stage or "*") for r in spec.get("routes", [])]
+
+    now = time.time()
+    stats = _update_stats(lambda s: dict(s))
+    demoted_until = lambda r: stats.get(_key(r), {}).get("demoted_until", 0)
+    healthy = [r for r in routes if demoted_until(r) <= now]
+    demoted = sorted((r for r in routes if demoted_until(r) > now), key=demoted_until)
+    return healthy + demoted
+
+
+def client_for(backend, default_client):
+    """Cliente OpenAI do backend (reaproveita o pool HTTP compartilhado)."""
+    if backend == DEFAULT_BACKEND and backend not in load_routes().get("backends", {}):
+        return default_client
+    with _lock:
+        if backend not in _clients:
+            import openai
+            spec = load_routes().get("backends", {}).get(backend)
+            if spec is None:
+                raise ValueError(f"backend '{backend}' não definido em MODEL_ROUTES")
+            api_key = spec.get("api_key") or get_env(spec.get("api_key_env", "OPENAI_API_KEY"), "local")
+            # sem retries do SDK: rate_limit._call_with_retry (ou a próxima rota) é quem repete
+            _clients[backend] = openai.OpenAI(api_key=api_key, base_url=spec.get("base_url"),
+                                              http_client=get_http_client(), max_retries=0)
+        return _clients[backend]
+
+
+def observe(route, latency, ok):
+    """Atualiza EWMA/falhas da rota e rebaixa (ou reabilita) conforme o SLO."""
+    alpha = float(get_env("ROUTER_EWMA_ALPHA", "0.3"))
+    max_failures = int(get_env("ROUTER_MAX_FAILURES", "2"))
+    demotion = float(get_env("ROUTER_DEMOTION_SECONDS", "600"))
+    slo = route.get("slo")
+
+    def update(stats):
+        st = stats.setdefault(_key(route), {"ewma": None, "failures": 0, "demoted_until": 0})
+        sample = latency if ok else max(latency, slo or latency)
+        st["ewma"] = sample if st["ewma"] is None else alpha * sample + (1 - alpha) * st["ewma"]
+        st["failures"] = 0 if ok else st["failures"] + 1
+        slow = slo is not None and st["ewma"] > slo
+        if slow or st["failures"] >= max_failures:
+            newly = st["demoted_until"] <= time.time()
+            st["demoted_until"] = time.time() + demotion
+            return ("demoted" if newly else None), st["ewma"]
+        if st["demoted_until"]:
+            st["demoted_until"] = 0
+            return "restored", st["ewma"]
+        return None, st["ewma"]
+
+    change, ewma = _update_stats(update)
+    log = ROUTER_LOG[(route["stage"], _key(route))]
+    log["calls"] += 1
+    log["failures"] += 0 if ok else 1
+    log["latencies"].append(latency)
+    _register_report()
+    if change == "demoted":
+        print_log(f"⬇️ Rota {_key(route)} rebaixada em '{route['stage']}' "
+                  f"(EWMA {ewma:.2f}s, SLO {route.get('slo')}s) por {demotion:.0f}s")
+    elif change == "restored":
+        print_log(f"⬆️ Rota {_key(route)} de volta em '{route['stage']}' (EWMA {ewma:.2f}s)")
+
+
+def _register_report():
+    global _report_registered
+    if not _report_registered:
+        atexit.register(print_router_report)
+        _report_registered = True
+
+
+def print_router_report():
+    for (stage, key), log in sorted(ROUTER_LOG.items()):
+        lat = sorted(log["latencies"])
+        p50 = lat[len(lat) // 2] if lat else 0.0
+        print_log(f"🧭 {stage} → {key}: {log['calls']} chamadas, {log['failures']} falhas, p50 {p50:.2f}s")
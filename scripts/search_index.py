@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+search_index.py
+Índice invertido BM25 dos artigos, para o bloco de "artigos relacionados" sem chamada ao LLM.
+
+Cada documento é o texto do HTML (htmlblog/ ou arquivo de segmentos) mais o tema e os tópicos
+da ficha, com peso dobrado. O índice tem duas partes:
+  • base: um JSON gzip em SEARCH_INDEX_PATH
+        {"docs": [[id, título, url, tamanho], ...], "postings": {termo: [nº_doc, tf, ...]}};
+  • deltas: um objeto pequeno por documento alterado em '<SEARCH_INDEX_PATH sem .json>.d/<id>.json'
+        {"id", "title", "url", "terms": {termo: tf}, "if_missing"}.
+O design_agent indexa cada HTML novo (ou re-renderizado) e o post_blog consulta os
+relacionados antes de publicar e grava a URL do Blogger depois — cada um grava só o delta do
+seu documento (alguns KB), sem baixar nem regravar a base. A leitura (load_index) aplica os
+deltas sobre a base. Passando de SEARCH_INDEX_MAX_DELTAS, quem gravou o delta compacta:
+aplica todos na base e os apaga — só essa gravação custa o índice inteiro (≈ 5 s com 10 mil
+artigos no bench_search.py), uma a cada SEARCH_INDEX_MAX_DELTAS atualizações. Só documentos
+com URL (publicados) entram no bloco.
+
+Concorrência: delta e base são regravados com if_generation_match (relê e repete em caso de
+disputa), e um delta só é apagado na compactação se não mudou desde que foi aplicado.
+
+A consulta usa os SEARCH_QUERY_TERMS termos mais característicos (tf·idf) do artigo atual —
+"mais como este" — em vez do texto inteiro, o que mantém a busca em milissegundos.
+
+Uso:
+    python3 search_index.py build [--urls]   # indexa htmlblog/ + arquivo; --urls busca as URLs no Blogger
+    python3 search_index.py compact          # aplica os deltas na base
+    python3 search_index.py query "texto"
+"""
+
+import html
+import json
+import math
+import os
+import re
+import sys
+import unicodedata
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from google.api_core.exceptions import NotFound, PreconditionFailed
+from utils import (
+    load_env, get_env, set_gcp_credentials, init_storage_client, list_blob_names,
+    download_blob_text, download_blob_text_versioned, upload_blob_text, get_basename,
+    load_archive_index, read_archive, print_log
+)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# título, tema e tópicos contam em dobro
+FIELD_BOOST = 2
+RELATED_START = "<!--relacionados-->"
+RELATED_END = "<!--/relacionados-->"
+
+STOPWORDS = set("""
+a o as os um uma uns umas de do da dos das em no na nos nas por pelo pela pelos pelas para
+pra com sem sob sobre entre ate e ou mas se que como quando onde qual quais quem cujo ja nao
+sim mais menos muito muita muitos muitas pouco ao aos ser sao foi era sera estar esta estao
+ter tem temos isso isto esse essa esses essas este estes aquele aquela seu sua seus suas
+voce voces ele ela eles elas nos lhe the and of to in for is on with it this that
+""".split())
+
+TAG_RE = re.compile(r"<(script|style|head)\b.*?</\1>|<[^>]+>", re.IGNORECASE | re.DOTALL)
+TITLE_RE = re.compile(r"<title>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+
+
+def tokenize(text):
+    """Minúsculas sem acentos, palavras de 3+ caracteres fora da lista de stopwords."""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+    return [t for t in re.findall(r"[a-z0-9]+", text) if len(t) > 2 and t not in STOPWORDS]
+
+
+def doc_terms(title, text, fields=()):
+    boosted = tokenize(" ".join([title, *fields])) * FIELD_BOOST
+    return Counter(boosted + tokenize(text))
+
+
+def html_text(raw_html):
+    return html.unescape(TAG_RE.sub(" ", raw_html))
+
+
+def html_title(raw_html, default=""):
+    m = TITLE_RE.search(raw_html)
+    return m.group(1).strip() if m else default
+
+
+class SearchIndex:
+    def __init__(self):
+        self.docs = []        # [id, título, url, tamanho] por nº do documento
+        self.ids = {}         # id → nº do documento
+        self.postings = {}    # termo → [nº, tf, nº, tf, ...]
+        self.total_len = 0
+        self._norms = None    # cache do fator de tamanho do BM25 por documento
+
+    def __len__(self):
+        return len(self.ids)
+
+    def remove(self, doc_id):
+        num = self.ids.get(doc_id)
+        if num is None:
+            return
+        for term in list(self.postings):
+            plist = self.postings[term]
+            kept = [x for i in range(0, len(plist), 2) if plist[i] != num for x in plist[i:i + 2]]
+            if kept:
+                self.postings[term] = kept
+            else:
+                del self.postings[term]
+        self.total_len -= self.docs[num][3]
+        self.docs[num][3] = 0
+        self._norms = None
+
+    def add(self, doc_id, title, text, fields=(), url=None):
+        """Indexa (ou reindexa) um documento; a URL existente é mantida se `url` for None."""
+        self.add_terms(doc_id, title, doc_terms(title, text, fields), url)
+
+    def add_terms(self, doc_id, title, terms, url=None):
+        """Como `add`, com os termos já contados (deltas gravados)."""
+        if doc_id in self.ids:
+            self.remove(doc_id)
+            num = self.ids[doc_id]
+            url = url or self.docs[num][2]
+        else:
+            num = len(self.docs)
+            self.ids[doc_id] = num
+            self.docs.append(None)
+        length = sum(terms.values())
+        self.docs[num] = [doc_id, title, url, length]
+        self.total_len += length
+        self._norms = None
+        for term, tf in terms.items():
+            self.postings.setdefault(term, []).extend((num, tf))
+
+    def set_url(self, doc_id, url):
+        num = self.ids.get(doc_id)
+        if num is None:
+            return False
+        self.docs[num][2] = url
+        return True
+
+    def _idf(self, term):
+        df = len(self.postings.get(term, ())) // 2
+        n = len(self.ids)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def query_terms(self, title, text, fields=(), limit=None):
+        """Os termos mais característicos do texto (tf·idf), para consultas "mais como este"."""
+        limit = limit or int(get_env("SEARCH_QUERY_TERMS", "25"))
+        terms = doc_terms(title, text, fields)
+        ranked = sorted(terms, key=lambda t: terms[t] * self._idf(t), reverse=True)
+        return [t for t in ranked[:limit] if t in self.postings]
+
+    def search(self, terms, k=5, exclude=(), published_only=True):
+        """[(id, título, url, score)] dos `k` melhores documentos para os termos."""
+        if not self.ids:
+            return []
+        if self._norms is None:
+            avgdl = self.total_len / len(self.ids)
+            self._norms = [BM25_K1 * (1 - BM25_B + BM25_B * d[3] / avgdl) for d in self.docs]
+        norms = self._norms
+        excluded = {self.ids[i] for i in exclude if i in self.ids}
+        scores = {}
+        for term in set(terms):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            weight = self._idf(term) * (BM25_K1 + 1)
+            for num, tf in zip(plist[::2], plist[1::2]):
+                scores[num] = scores.get(num, 0.0) + weight * tf / (tf + norms[num])
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+        out = []
+        for num, score in ranked:
+            doc_id, title, url, _ = self.docs[num]
+            if num in excluded or (published_only and not url):
+                continue
+            out.append((doc_id, title, url, score))
+            if len(out) == k:
+                break
+        return out
+
+    def related(self, doc_id, title, text, fields=(), k=3):
+        return self.search(self.query_terms(title, text, fields), k=k, exclude=(doc_id,))
+
+    def to_json(self):
+        return json.dumps({"docs": self.docs, "postings": self.postings}, ensure_ascii=False,
+                          separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        index = cls()
+        index.docs = data["docs"]
+        index.postings = data["postings"]
+        index.ids = {d[0]: num for num, d in enumerate(index.docs)}
+        index.total_len = sum(d[3] for d in index.docs)
+        return index
+
+
+def index_path():
+    return get_env("SEARCH_INDEX_PATH", "index/search.json")
+
+
+def delta_folder():
+    return f"{os.path.splitext(index_path())[0]}.d"
+
+
+def delta_path(doc_id):
+    return f"{delta_folder()}/{doc_id}.json"
+
+
+def apply_delta(index, record):
+    """Aplica um delta: documento completo, ou só a URL se `if_missing` e o documento já existe."""
+    if record.get("if_missing") and record["id"] in index.ids:
+        if record.get("url"):
+            index.set_url(record["id"], record["url"])
+        return
+    index.add_terms(record["id"], record["title"], record["terms"], record.get("url"))
+
+
+def load_deltas(client, bucket):
+    """[(caminho, geração, registro)] dos deltas ainda não compactados."""
+    paths = [n for n in list_blob_names(client, bucket, delta_folder()) if n.endswith(".json")]
+
+    def fetch(path):
+        try:
+            text, generation = download_blob_text_versioned(client, bucket, path)
+        except NotFound:
+            return None  # compactado entre a listagem e a leitura
+        return (path, generation, json.loads(text)) if text is not None else None
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        return [d for d in pool.map(fetch, paths) if d]
+
+
+def load_base(client, bucket):
+    """(base, geração); vazia só se ainda não existe (outros erros sobem)."""
+    text, generation = download_blob_text_versioned(client, bucket, index_path())
+    return (SearchIndex.from_json(text) if text is not None else SearchIndex()), generation
+
+
+def load_index(client, bucket):
+    """Base + deltas pendentes: o estado atual do índice."""
+    index, _ = load_base(client, bucket)
+    for _, _, record in load_deltas(client, bucket):
+        apply_delta(index, record)
+    return index
+
+
+def update_index(client, bucket, change, attempts=5):
+    """
+    Relê a base, aplica `change(index)` e a regrava inteira com if_generation_match; se outro
+    processo gravou no meio-tempo, repete sobre a versão nova. Custa o índice inteiro: usado
+    na compactação e no build; atualizações de um documento gravam só o delta (update_delta).
+    """
+    for attempt in range(attempts):
+        index, generation = load_base(client, bucket)
+        change(index)
+        try:
+            upload_blob_text(client, bucket, index_path(), index.to_json(), if_generation_match=generation)
+            return index
+        except PreconditionFailed:
+            print_log(f"🔁 Índice de busca alterado por outro processo; tentativa {attempt + 2}/{attempts}.")
+    raise RuntimeError(f"índice de busca em {index_path()} em disputa após {attempts} tentativas")
+
+
+def compact(client, bucket):
+    """Aplica os deltas na base e apaga os que não mudaram desde a leitura."""
+    deltas = load_deltas(client, bucket)
+
+    def change(index):
+        for _, _, record in deltas:
+            apply_delta(index, record)
+
+    index = update_index(client, bucket, change)
+    gcs_bucket = client.bucket(bucket)
+    for path, generation, _ in deltas:
+        try:
+            gcs_bucket.blob(path).delete(if_generation_match=generation)
+        except (NotFound, PreconditionFailed):
+            pass  # regravado depois da leitura: fica para a próxima compactação
+    print_log(f"🗜️ {len(deltas)} deltas aplicados ao índice de busca ({len(index)} artigos).")
+    return index
+
+
+def update_delta(client, bucket, doc_id, merge, attempts=5):
+    """
+    Relê o delta do documento, grava `merge(registro_atual_ou_None)` com if_generation_match e
+    compacta se os deltas passaram de SEARCH_INDEX_MAX_DELTAS.
+    """
+    path = delta_path(doc_id)
+    for attempt in range(attempts):
+        text, generation = download_blob_text_versioned(client, bucket, path)
+        record = merge(json.loads(text) if text is not None else None)
+        try:
+            upload_blob_text(client, bucket, path, json.dumps(record, ensure_ascii=False),
+                             if_generation_match=generation)
+            break
+        except PreconditionFailed:
+            print_log(f"🔁 Delta de {doc_id} alterado por outro processo; tentativa {attempt + 2}/{attempts}.")
+    else:
+        raise RuntimeError(f"delta {path} em disputa após {attempts} tentativas")
+
+    pending = sum(1 for n in list_blob_names(client, bucket, delta_folder()) if n.endswith(".json"))
+    if pending > int(get_env("SEARCH_INDEX_MAX_DELTAS", "50")):
+        compact(client, bucket)
+    return record
+
+
+def record_published(client, bucket, doc_id, title, text, url):
+    """Grava a URL do post publicado (indexando-o se ainda não estiver no índice)."""
+    def merge(record):
+        if record is not None:
+            return dict(record, url=url)
+        # sem delta: só a URL, a menos que o documento nem esteja na base
+        return {"id": doc_id, "title": title, "url": url, "terms": doc_terms(title, text),
+                "if_missing": True}
+    return update_delta(client, bucket, doc_id, merge)
+
+
+def ficha_fields(ficha_text):
+    """(tema, tópicos) de uma ficha; vazio se ausente ou inválida."""
+    try:
+        ficha = json.loads(ficha_text or "")
+        return [ficha.get("theme", "")] + list(ficha.get("topics", []))
+    except (ValueError, AttributeError):
+        return []
+
+
+def index_article(client, bucket, doc_id, raw_html, fields=(), url=None):
+    """Indexa um HTML novo/alterado gravando o delta do documento (chamado pelo design_agent)."""
+    title, text = html_title(raw_html, doc_id), html_text(raw_html)
+    terms = doc_terms(title, text, fields)
+
+    def merge(record):
+        # re-renderização mantém a URL já gravada no delta (a da base é mantida por add_terms)
+        return {"id": doc_id, "title": title, "url": url or (record or {}).get("url"),
+                "terms": terms, "if_missing": False}
+    record = update_delta(client, bucket, doc_id, merge)
+    print_log(f"🔎 {doc_id} indexado ({sum(record['terms'].values())} termos).")
+    return record
+
+
+def related_block(results):
+    """Bloco HTML com os relacionados (vazio se não houver nenhum publicado)."""
+    if not results:
+        return ""
+    items = "".join(f'<li><a href="{html.escape(url)}">{html.escape(title)}</a></li>'
+                    for _, title, url, _ in results)
+    return f"{RELATED_START}<h2>Artigos relacionados</h2><ul>{items}</ul>{RELATED_END}"
+
+
+def blogger_urls(service, blog_id):
+    """{título: url} de todos os posts publicados no blog."""
+    urls, token = {}, None
+    while True:
+        resp = service.posts().list(blogId=blog_id, maxResults=500, fetchBodies=False,
+                                    pageToken=token).execute()
+        for post in resp.get("items", []):
+            urls[post["title"].strip()] = post["url"]
+        token = resp.get("nextPageToken")
+        if not token:
+            return urls
+
+
+def build(client, bucket, with_urls=False):
+    """Indexa tudo o que ainda não está no índice: HTMLs avulsos e artigos arquivados."""
+    html_folder = get_env("HTML_FOLDER", "htmlblog")
+    ficha_folder = get_env("FICHAUM_FOLDER", "fichaum")
+    known = load_index(client, bucket).ids
+    # downloads fora da atualização condicional: só a aplicação é repetida em caso de disputa
+    new_docs = []
+    for path in sorted(n for n in list_blob_names(client, bucket, html_folder) if n.endswith(".html")):
+        base = get_basename(path)[:-len(".html")]
+        if base in known:
+            continue
+        try:
+            fields = ficha_fields(download_blob_text(client, bucket, f"{ficha_folder}/{base}.json"))
+        except NotFound:
+            fields = []
+        raw = download_blob_text(client, bucket, path)
+        new_docs.append((base, html_title(raw, base), html_text(raw), fields))
+
+    archive = load_archive_index(client, bucket)
+    missing = [i for i in sorted(archive["entries"]) if i not in known]
+    for record in read_archive(client, bucket, missing, archive):
+        raw = record.get("html") or ""
+        new_docs.append((record["id"], html_title(raw, record["id"]), html_text(raw),
+                         ficha_fields(record.get("ficha"))))
+
+    urls = {}
+    if with_urls:
+        from credentials import get_blogger_service
+        service = get_blogger_service(get_env("BLOGGER_TOKEN_FILE", required=True))
+        urls = blogger_urls(service, get_env("BLOG_ID", required=True))
+
+    def change(index):
+        for doc_id, title, text, fields in new_docs:
+            if doc_id not in index.ids:
+                index.add(doc_id, title, text, fields)
+        for doc in index.docs:
+            if doc[1] in urls:
+                index.set_url(doc[0], urls[doc[1]])
+
+    index = update_index(client, bucket, change)
+    print_log(f"→ {len(new_docs)} artigos novos indexados ({len(index)} no total).")
+    if with_urls:
+        print_log(f"→ URLs do Blogger associadas a {sum(1 for d in index.docs if d[1] in urls)} artigos.")
+    return index
+
+
+def main():
+    print_log("=== Iniciando search_index ===")
+    load_env()
+    mode = sys.argv[1] if len(sys.argv) > 1 else ""
+    if mode not in ("build", "compact", "query"):
+        print_log("❌ Uso: search_index.py build [--urls] | compact | query \"texto\"")
+        sys.exit(1)
+
+    set_gcp_credentials(get_env("AUTH_JSON_PATH"))
+    client, bucket = init_storage_client()
+    if mode == "build":
+        build(client, bucket, with_urls="--urls" in sys.argv)
+        return
+    if mode == "compact":
+        compact(client, bucket)
+        return
+
+    index = load_index(client, bucket)
+    text = " ".join(sys.argv[2:])
+    for doc_id, title, url, score in index.search(tokenize(text), k=10, published_only=False):
+        print_log(f"{score:6.2f}  {doc_id}  {title}  {url or '(não publicado)'}")
+
+
+if __name__ == "__main__":
+    main()
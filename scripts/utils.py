@@ -1,8 +1,15 @@
 # utils.py
+import atexit
 import os
 import json
+import gzip
+import base64
+import hashlib
+import threading
+import time
 from typing import List, Optional
 from google.cloud import storage
+import httpx
 import openai
 
 def load_env():
@@ -25,22 +32,253 @@ def init_storage_client():
     # storage.Client() já vai usar a conta ativa no CLI se a env GOOGLE_APPLICATION_CREDENTIALS não estiver setada!
     return storage.Client(), bucket_name
 
-def init_openai_client():
+def init_openai_client(stage=None):
+    """Cliente OpenAI com controle de vazão (RPM/TPM) e contabilidade de uso — ver rate_limit.py."""
+    from rate_limit import RateLimitedOpenAI
     api_key = get_env("OPENAI_API_KEY", required=True)
-    return openai.OpenAI(api_key=api_key)
+    # OPENAI_BASE_URL permite apontar para um endpoint compatível (ex.: fake_openai_batch.py)
+    base_url = get_env("OPENAI_BASE_URL")
+    client = openai.OpenAI(api_key=api_key, base_url=base_url, http_client=get_http_client())
+    return RateLimitedOpenAI(client, stage=stage)
+
+# --- transporte HTTP compartilhado (OpenAI, LinkedIn, download da capa) ---
+
+HTTP_STATS = {"requests": 0, "connections": 0, "connect_seconds": 0.0}
+_http_client = None
+_http_lock = threading.Lock()
+_h2_warned = []
+
+def _trace_connections(request):
+    """Hook de requisição: mede TCP + TLS de cada conexão nova aberta pelo pool."""
+    started = {}
+
+    def trace(event, info):
+        step, _, phase = event.rpartition(".")
+        if step in ("connection.connect_tcp", "connection.start_tls"):
+            if phase == "started":
+                started[step] = time.perf_counter()
+            elif phase == "complete" and step in started:
+                with _http_lock:
+                    HTTP_STATS["connect_seconds"] += time.perf_counter() - started.pop(step)
+                    if step == "connection.connect_tcp":
+                        HTTP_STATS["connections"] += 1
+
+    request.extensions["trace"] = trace
+    with _http_lock:
+        HTTP_STATS["requests"] += 1
+
+def new_http_client(http2=None, pool_size=None, keepalive=None):
+    """
+    Cliente httpx com pool de conexões keep-alive e HTTP/2 (se o pacote `h2` estiver
+    instalado): o DNS só é resolvido ao abrir uma conexão nova. Use `get_http_client()`
+    para o cliente compartilhado do processo.
+    """
+    from importlib.util import find_spec
+    if http2 is None:
+        http2 = get_env("HTTP_HTTP2", "1") == "1"
+    if http2 and find_spec("h2") is None:
+        if not _h2_warned:
+            print_log("⚠️ HTTP/2 indisponível (pip install 'httpx[http2]'); usando HTTP/1.1 keep-alive.")
+            _h2_warned.append(True)
+        http2 = False
+    pool_size = pool_size or int(get_env("HTTP_POOL_SIZE", "20"))
+    keepalive = keepalive if keepalive is not None else float(get_env("HTTP_KEEPALIVE_SECONDS", "90"))
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size,
+                          keepalive_expiry=keepalive)
+    return httpx.Client(
+        http2=http2,
+        limits=limits,
+        timeout=httpx.Timeout(float(get_env("HTTP_TIMEOUT_SECONDS", "60")), connect=10.0),
+        follow_redirects=True,
+        event_hooks={"request": [_trace_connections]},
+    )
+
+def get_http_client():
+    """Cliente HTTP único por processo: conexões TLS reaproveitadas entre todas as chamadas."""
+    global _http_client
+    with _http_lock:
+        if _http_client is None:
+            _http_client = new_http_client()
+            atexit.register(print_http_stats)
+        return _http_client
+
+def print_http_stats():
+    st = HTTP_STATS
+    if st["requests"]:
+        print_log(
+            f"🌐 HTTP: {st['requests']} requisições em {st['connections']} conexões "
+            f"(setup TCP+TLS {st['connect_seconds']:.2f}s)"
+        )
 
 def list_blob_names(client, bucket_name, prefix) -> List[str]:
     return [b.name for b in client.list_blobs(bucket_name, prefix=f"{prefix}/")]
 
+# Cache-Control por tipo de artefato. Texto (fichas, rascunhos, HTML) é artefato de trabalho
+# lido só pelos agentes: nunca cachear e `no-transform` para o GCS não descomprimir no caminho
+# (a descompressão é feita em download_blob_text). Imagens têm nome único por artigo e a
+# folha de estilo compartilhada (page_weight.py) tem o hash do conteúdo no nome; o PNG
+# original da capa não é público (só serve para regerar as variantes).
+CACHE_CONTROL_BY_EXT = {
+    ".json": "private, max-age=0, no-transform",
+    ".html": "private, max-age=0, no-transform",
+    ".jsonl": "private, max-age=0, no-transform",
+    ".jpg":  "public, max-age=31536000, immutable",
+    ".png":  "private, max-age=31536000, immutable",
+    ".webp": "public, max-age=31536000, immutable",
+    ".css":  "public, max-age=31536000, immutable",
+}
+
+# Contadores da execução atual (ver print_upload_stats)
+UPLOAD_STATS = {"written": 0, "skipped": 0, "bytes_raw": 0, "bytes_stored": 0, "bytes_skipped": 0}
+# uploads concorrentes (estágios do DAG, capa em segundo plano) atualizam os contadores
+_upload_lock = threading.Lock()
+
+def cache_control_for(blob_name: str) -> Optional[str]:
+    return CACHE_CONTROL_BY_EXT.get(os.path.splitext(blob_name)[1].lower())
+
+def _same_content(blob, data: bytes) -> bool:
+    """Compara o MD5 local com o do objeto; objetos compostos só têm CRC32C."""
+    if blob.md5_hash:
+        local = base64.b64encode(hashlib.md5(data).digest()).decode()
+        return local == blob.md5_hash
+    if blob.crc32c:
+        import google_crc32c
+        local = base64.b64encode(google_crc32c.Checksum(data).digest()).decode()
+        return local == blob.crc32c
+    return False
+
 def download_blob_text(client, bucket_name, blob_name) -> str:
     bucket = client.bucket(bucket_name)
     blob = bucket.blob(blob_name)
-    return blob.download_as_text()
+    # raw_download: recebe os bytes como gravados e descomprime aqui, gzip ou não
+    data = blob.download_as_bytes(raw_download=True)
+    return _decode_text(data)
+
+def _decode_text(data: bytes) -> str:
+    if data[:2] == b"\x1f\x8b":
+        data = gzip.decompress(data)
+    return data.decode("utf-8")
 
-def upload_blob_text(client, bucket_name, blob_name, content, content_type="application/json"):
+def download_blob_text_versioned(client, bucket_name, blob_name):
+    """
+    (texto, geração) do objeto, ou (None, 0) se ele não existe — a geração serve de
+    `if_generation_match` na regravação (0 = só grava se continuar inexistente).
+    Outros erros (rede, permissão) sobem: quem chama não deve tratá-los como "vazio".
+    """
+    blob = client.bucket(bucket_name).get_blob(blob_name)
+    if blob is None:
+        return None, 0
+    data = blob.download_as_bytes(raw_download=True, if_generation_match=blob.generation)
+    return _decode_text(data), blob.generation
+
+def upload_blob_bytes(client, bucket_name, blob_name, data: bytes, content_type,
+                      content_encoding=None, cache_control=None, public=False, raw_size=None,
+                      if_generation_match=None) -> bool:
+    """
+    Grava `data` no bucket, a menos que o objeto já exista com o mesmo conteúdo e metadados.
+    Retorna True se gravou, False se a escrita foi ignorada. Com `if_generation_match`, a
+    escrita é condicional (PreconditionFailed se o objeto mudou) e nunca é ignorada.
+    """
     bucket = client.bucket(bucket_name)
+    cache_control = cache_control or cache_control_for(blob_name)
+    raw_size = raw_size if raw_size is not None else len(data)
+
+    if if_generation_match is None and get_env("GCS_SKIP_UNCHANGED", "1") == "1":
+        existing = bucket.get_blob(blob_name)
+        if (existing is not None and _same_content(existing, data)
+                and existing.content_encoding == content_encoding
+                and existing.cache_control == cache_control):
+            # conteúdo igual não garante ACL igual (ex.: gravado antes sem public=True)
+            if public:
+                existing.make_public()
+            with _upload_lock:
+                UPLOAD_STATS["skipped"] += 1
+                UPLOAD_STATS["bytes_skipped"] += raw_size
+            return False
+
     blob = bucket.blob(blob_name)
-    blob.upload_from_string(content, content_type=content_type)
+    blob.cache_control = cache_control
+    blob.content_encoding = content_encoding
+    if if_generation_match is None:
+        blob.upload_from_string(data, content_type=content_type)
+    else:
+        blob.upload_from_string(data, content_type=content_type, if_generation_match=if_generation_match)
+    if public:
+        blob.make_public()
+    with _upload_lock:
+        UPLOAD_STATS["written"] += 1
+        UPLOAD_STATS["bytes_raw"] += raw_size
+        UPLOAD_STATS["bytes_stored"] += len(data)
+    return True
+
+def upload_blob_text(client, bucket_name, blob_name, content, content_type="application/json",
+                     if_generation_match=None):
+    raw = content.encode("utf-8")
+    if get_env("GCS_GZIP_TEXT", "1") == "1":
+        # mtime=0 → saída determinística, para o MD5 não mudar entre execuções idênticas
+        data = gzip.compress(raw, compresslevel=9, mtime=0)
+        return upload_blob_bytes(client, bucket_name, blob_name, data, content_type,
+                                 content_encoding="gzip", raw_size=len(raw),
+                                 if_generation_match=if_generation_match)
+    return upload_blob_bytes(client, bucket_name, blob_name, raw, content_type,
+                             if_generation_match=if_generation_match)
+
+def delete_blob(client, bucket_name, blob_name) -> bool:
+    blob = client.bucket(bucket_name).get_blob(blob_name)
+    if blob is None:
+        return False
+    blob.delete()
+    return True
+
+# --- arquivo de segmentos (compact_archive.py) ---
+# Artigos finalizados saem de fichaum/, rascunho/ e htmlblog/ e viram uma linha JSONL em
+# '<ARCHIVE_FOLDER>/<AAAA-MM>.jsonl'. O índice '_index.json' guarda, por id (base do artigo),
+# [segmento, offset, tamanho]; cada leitura baixa o índice e faz um único download por faixa
+# de bytes por segmento envolvido (em geral um só). Segmentos são gravados sem gzip para
+# que as faixas de bytes correspondam ao arquivo.
+
+ARCHIVE_INDEX = "_index.json"
+
+def archive_folder() -> str:
+    return get_env("ARCHIVE_FOLDER", "archive")
+
+def load_archive_index(client, bucket_name, with_generation=False):
+    """
+    Índice do arquivo: {"segments": {segmento: bytes}, "entries": {id: [segmento, offset, tamanho]}}.
+    Vazio só se o índice não existe; com `with_generation`, retorna (índice, geração).
+    """
+    text, generation = download_blob_text_versioned(client, bucket_name, f"{archive_folder()}/{ARCHIVE_INDEX}")
+    index = json.loads(text) if text is not None else {"segments": {}, "entries": {}}
+    return (index, generation) if with_generation else index
+
+def read_archive(client, bucket_name, ids, index=None) -> List[dict]:
+    """Registros arquivados de `ids` (na ordem pedida; ids ausentes são ignorados)."""
+    index = index if index is not None else load_archive_index(client, bucket_name)
+    entries = index["entries"]
+    by_segment = {}
+    for article_id in ids:
+        if article_id in entries:
+            segment, offset, length = entries[article_id]
+            by_segment.setdefault(segment, []).append((article_id, offset, length))
+    records = {}
+    bucket = client.bucket(bucket_name)
+    for segment, items in by_segment.items():
+        # uma faixa cobrindo todos os registros pedidos do segmento (contíguos no "últimos N")
+        start = min(offset for _, offset, _ in items)
+        end = max(offset + length for _, offset, length in items)
+        data = bucket.blob(f"{archive_folder()}/{segment}").download_as_bytes(start=start, end=end - 1)
+        for article_id, offset, length in items:
+            records[article_id] = json.loads(data[offset - start:offset - start + length])
+    return [records[i] for i in ids if i in records]
+
+def print_upload_stats():
+    st = UPLOAD_STATS
+    gzip_saved = st["bytes_raw"] - st["bytes_stored"]
+    print_log(
+        f"📦 GCS: {st['written']} gravações, {st['skipped']} ignoradas (conteúdo idêntico); "
+        f"economia: {gzip_saved / 1024:.1f} KB por compressão, "
+        f"{st['bytes_skipped'] / 1024:.1f} KB não reenviados"
+    )
 
 def filter_json_blobs(blob_names: List[str]) -> List[str]:
     return [b for b in blob_names if b.lower().endswith('.json')]